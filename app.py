@@ -1,8 +1,27 @@
 import streamlit as st
-import google.generativeai as genai
-from PyPDF2 import PdfReader
-import importlib.metadata
-import random
+import importlib
+import os
+import json
+import logging
+import threading
+from contextlib import contextmanager
+
+from streamlit.runtime.scriptrunner import get_script_run_ctx
+
+from checker import config
+from checker.budgeting import TokenEstimator
+from checker.clients import ClientPool
+from checker.extraction import ExtractionPool, extract_documents
+from checker.errors import INVALID_KEY, SAFETY
+from checker.health import ModelHealth
+from checker.memory import SESSION, MemoryLimitExceeded, estimate_request_bytes, process_memory
+from checker.metrics import MetricsRegistry, RequestTrace, start_metrics_server
+from checker.prompts import EXTERNAL_PROMPT, STUDENT_PROMPT
+from checker.review import FILE_CHAR_LIMIT, review_documents
+from checker.revisions import ReviewHistory
+from checker.rules import EXTERNAL, PROHIBITED, STUDENT, RuleEngine
+from checker.uploads import PdfSource
+from checker.workflow import WORKFLOW_DOT
 
 # --- PAGE CONFIGURATION ---
 st.set_page_config(
@@ -12,6 +31,84 @@ st.set_page_config(
     initial_sidebar_state="expanded"
 )
 
+logger = logging.getLogger(__name__)
+
+# --- SHARED STATE (one per server process, shared by every session) ---
+# Key pool, queue, memory budget and caches are configured in checker/config.py,
+# shared with the bulk CLI.
+# The Gemini SDK takes about a second to import, so it is only imported where a
+# model is called; preload_sdk() warms it up after the first page has rendered.
+@st.cache_resource
+def preload_sdk():
+    threading.Thread(target=importlib.import_module, args=("google.generativeai",), daemon=True).start()
+
+@st.cache_resource
+def get_client_pool():
+    # Gemini clients per API key, so sessions never share (or swap) a key.
+    return ClientPool()
+
+@st.cache_data
+def get_sdk_version():
+    import importlib.metadata
+    try:
+        return importlib.metadata.version("google-generativeai")
+    except importlib.metadata.PackageNotFoundError:
+        return "Unknown"
+
+@st.cache_resource
+def get_key_scheduler(keys):
+    return config.key_scheduler(keys)
+
+@st.cache_resource
+def get_admission_queue(key_count):
+    return config.admission_queue(key_count)
+
+@st.cache_resource
+def get_metrics():
+    # BCS_METRICS_LOG appends every request as a JSON line; BCS_METRICS_PORT
+    # serves /metrics (Prometheus) and /requests.jsonl for the dashboards, on
+    # BCS_METRICS_HOST (localhost unless a scraper elsewhere needs it).
+    registry = MetricsRegistry(log_path=os.environ.get("BCS_METRICS_LOG") or None)
+    registry.gauge("bcs_memory_reserved_bytes", "Memory reserved by running reviews.",
+                   lambda: get_memory_budget().snapshot()["used_bytes"])
+    registry.gauge("bcs_process_resident_bytes", "Resident memory of the portal process.",
+                   lambda: process_memory()["rss_bytes"])
+    if os.environ.get("BCS_METRICS_PORT"):
+        try:
+            start_metrics_server(registry, int(os.environ["BCS_METRICS_PORT"]),
+                                 host=os.environ.get("BCS_METRICS_HOST", "127.0.0.1"))
+        except OSError as e:
+            # Port taken or host unavailable: the portal still works, just without the endpoint.
+            logger.warning("Metrics server not started on port %s: %s", os.environ["BCS_METRICS_PORT"], e)
+    return registry
+
+@st.cache_resource
+def get_memory_budget():
+    return config.memory_budget()
+
+@st.cache_resource
+def get_token_estimator():
+    return TokenEstimator()
+
+@st.cache_resource
+def get_model_health():
+    # Circuit breakers for target_models, so a rate-limited model is skipped
+    # for everyone until its cooldown ends.
+    return ModelHealth()
+
+@st.cache_resource
+def get_rule_engine():
+    # Compiling the combined rule pattern once is most of its cost.
+    return RuleEngine()
+
+@st.cache_resource
+def get_text_cache():
+    return config.text_cache()
+
+@st.cache_resource
+def get_response_cache():
+    return config.response_cache()
+
 # --- SIDEBAR: GLOBAL SETTINGS ---
 with st.sidebar:
     st.header("⚙️ Configuration")
@@ -75,12 +172,13 @@ with st.sidebar:
     
     # 6. KEY MANAGEMENT
     api_key = None
+    key_scheduler = None
     
     # Check for the list of keys (Primary Method for Classrooms)
     if "DISTRICT_KEYS" in st.secrets:
-        key_pool = st.secrets["DISTRICT_KEYS"]
-        district_key = random.choice(key_pool)
-        api_key = district_key
+        # Keys are handed out per request by the shared scheduler, which
+        # skips keys that are rate-limited or out of daily quota.
+        key_scheduler = get_key_scheduler(tuple(st.secrets["DISTRICT_KEYS"]))
         
         if user_mode == "AP Research Student":
             st.success(f"✅ District License Active")
@@ -90,13 +188,15 @@ with st.sidebar:
                 user_key = st.text_input("Paste your personal key:", type="password")
                 if user_key:
                     api_key = user_key
+                    key_scheduler = None
                     st.success("✅ Using Personal Key")
         else:
             st.success("✅ District License Active")
 
     # Fallback for Single Key (Legacy Method)
     elif "GOOGLE_API_KEY" in st.secrets:
-        api_key = st.secrets["GOOGLE_API_KEY"]
+        # The shared key is still shared by every session: a pool of one.
+        key_scheduler = get_key_scheduler((st.secrets["GOOGLE_API_KEY"],))
         if user_mode == "AP Research Student":
             st.success("✅ District License Active")
             with st.expander("🚀 Performance Boost (Use Your Own Key)"):
@@ -105,6 +205,7 @@ with st.sidebar:
                 user_key = st.text_input("Paste your personal key:", type="password")
                 if user_key:
                     api_key = user_key
+                    key_scheduler = None
                     st.success("✅ Using Personal Key")
         else:
             st.success("✅ District License Active")
@@ -119,22 +220,189 @@ with st.sidebar:
     
     # 7. DIAGNOSTICS
     if user_mode == "AP Research Student":
-        try:
-            lib_ver = importlib.metadata.version("google-generativeai")
-        except:
-            lib_ver = "Unknown"
-        st.caption(f"⚙️ System Version: {lib_ver}")
+        st.caption(f"⚙️ System Version: {get_sdk_version()}")
+        cache_stats = get_text_cache().stats()
+        st.caption(
+            f"📄 PDF Cache: {cache_stats['entries']} files · "
+            f"{cache_stats['hits'] + cache_stats['disk_hits']} hits / {cache_stats['misses']} misses"
+        )
+        if key_scheduler is not None:
+            with st.expander(f"🔑 Key Pool ({len(key_scheduler)} keys)"):
+                st.dataframe(key_scheduler.snapshot(), hide_index=True)
+                queue = get_admission_queue(len(key_scheduler)).snapshot()
+                st.caption(
+                    f"🚦 Review Queue: {queue['running']}/{queue['capacity']} running · "
+                    f"{queue['waiting']} waiting · ~{queue['avg_seconds']:.0f}s per review"
+                )
+        memory = get_memory_budget().snapshot()
+        st.caption(
+            f"🧠 Memory: {memory['used_bytes'] / 2**20:.0f} / {memory['total_bytes'] / 2**20:.0f} MB reserved · "
+            f"{memory['session_bytes'] / 2**20:.0f} MB per session"
+        )
+        # Only this session's own requests; other students' traces stay on the server.
+        metrics_jsonl = get_metrics().jsonl(get_script_run_ctx().session_id)
+        if metrics_jsonl:
+            st.download_button(
+                "📈 Export My Request Metrics (JSONL)", metrics_jsonl,
+                file_name="request-metrics.jsonl", mime="application/x-ndjson",
+            )
+        model_rows = get_model_health().snapshot()
+        if model_rows:
+            with st.expander("🩺 Model Health"):
+                st.dataframe(model_rows, hide_index=True)
 
 # --- HELPER FUNCTION: PDF TEXT EXTRACTION ---
-def extract_text(uploaded_file):
+# Uploads are only parsed when "Run Compliance Check" is pressed, page by page,
+# up to FILE_CHAR_LIMIT; the token budget in EXECUTION LOGIC decides what is sent.
+# Each upload is spooled to a temporary file (BCS_SPOOL_DIR) and parsed through
+# a memory map, so the extraction workers never get a copy of the bytes.
+
+@st.cache_resource
+def get_extraction_pool():
+    return ExtractionPool()
+
+def read_documents(raw_inputs, status, char_budget=FILE_CHAR_LIMIT, on_file=None):
+    # raw_inputs maps doc_type -> pasted text, an UploadedFile, or a list of them.
+    # Returns doc_type -> [(file name, text), ...]; pasted text counts as one file.
+    uploads = []
+    for value in raw_inputs.values():
+        if isinstance(value, list):
+            uploads.extend(value)
+        elif not isinstance(value, str):
+            uploads.append(value)
+
+    def show_progress(name, page_number, page_count):
+        status.info(f"📄 Reading {name} (page {page_number} of {page_count})...")
+
+    spool_dir = os.environ.get("BCS_SPOOL_DIR") or None
+    sources = []
+    try:
+        for f in uploads:
+            sources.append(PdfSource.spool(f.name, f, spool_dir))
+        texts = extract_documents(
+            [(source.name, source) for source in sources],
+            get_text_cache(),
+            pool=get_extraction_pool() if len(uploads) > 1 else None,
+            char_budget=char_budget,
+            on_page=show_progress,
+            on_file=on_file,
+        )
+    finally:
+        for source in sources:
+            source.close()
+    extracted = dict(zip(map(id, uploads), texts))
+
+    files_by_type = {}
+    for doc_type, value in raw_inputs.items():
+        if isinstance(value, str):
+            files_by_type[doc_type] = [("Pasted text", value)]
+        else:
+            files = value if isinstance(value, list) else [value]
+            files_by_type[doc_type] = [(f.name, extracted[id(f)]) for f in files]
+    return files_by_type
+
+def estimate_input_bytes(raw_inputs):
+    sizes = []
+    for value in raw_inputs.values():
+        if isinstance(value, str):
+            sizes.append(len(value))
+        else:
+            sizes.extend(f.size for f in (value if isinstance(value, list) else [value]))
+    return estimate_request_bytes(sizes, FILE_CHAR_LIMIT)
+
+@contextmanager
+def hold_memory(nbytes, status):
+    # Yields the seconds spent waiting for room; a review that doesn't fit ends the run.
+    status.info("🧠 Reserving memory for your files...")
     try:
-        reader = PdfReader(uploaded_file)
-        text = ""
-        for page in reader.pages:
-            text += page.extract_text()
-        return text
-    except Exception as e:
-        return f"Error reading PDF: {e}"
+        with get_memory_budget().reserve(get_script_run_ctx().session_id, nbytes) as waited:
+            yield waited
+    except MemoryLimitExceeded as e:
+        if e.scope == SESSION and e.requested <= get_memory_budget().session_bytes:
+            status.error("⏳ Your other review is still using this session's memory. Please wait for it to finish and try again.")
+        elif e.scope == SESSION:
+            status.error(
+                f"❌ These files are too large to review together (~{e.requested / 2**20:.1f} MB to process, "
+                f"limit {e.limit / 2**20:.1f} MB). Please upload fewer or smaller PDFs."
+            )
+        else:
+            status.error("⏳ The portal is busy with other large packets right now. Please try again in a minute.")
+        st.stop()
+
+def show_truncated(truncated):
+    for f in truncated:
+        st.caption(
+            f"**{f['name']}** is longer than the portal reads: only its first {f['pages']} pages "
+            f"({f['chars']:,} characters) were reviewed. Split it into smaller PDFs to have the rest checked."
+        )
+
+def show_review_panels(result, truncated=()):
+    # What the review found before asking the model: keyword flags, trimming and
+    # revision diffs. ``truncated`` lists files cut off at FILE_CHAR_LIMIT.
+    prescreen = result["prescreen"]
+    prescreen_flags = [f for f in prescreen["findings"] if f["kind"] == PROHIBITED]
+    if prescreen_flags or prescreen["missing"]:
+        with st.expander(f"🔎 Instant Pre-Screen: {len(prescreen_flags)} flag(s), {len(prescreen['missing'])} missing", expanded=prescreen["strict_fail"]):
+            if prescreen_flags:
+                st.dataframe([
+                    {
+                        "Topic": f["label"],
+                        "Document": f["doc_type"],
+                        "Page": f["page"],
+                        "Asked Of Participants": "Yes" if f["question"] else "—",
+                        "Text": f["line"],
+                    }
+                    for f in prescreen_flags
+                ], hide_index=True)
+            for rule in prescreen["missing"]:
+                st.caption(f"No match found for **{rule['label']}**. {rule['action']}")
+            st.caption("Keyword scan only; the AI review confirms or dismisses each flag.")
+
+    budget_report = result["budget_report"]
+    if budget_report and result["map_reduce"]:
+        label = f"reviewed in {result['parts']} parts" if result["parts"] else "reviewed part by part"
+        with st.expander(f"📚 Large Packet: {label}", expanded=bool(truncated)):
+            st.dataframe([
+                {"Document": row["doc_type"], "Tokens": f"{row['tokens_total']:,}"}
+                for row in budget_report
+            ], hide_index=True)
+            st.caption("Too long for one review, so every part was checked on its own and the findings merged.")
+            show_truncated(truncated)
+    elif budget_report:
+        trimmed = [row for row in budget_report if row["sections_dropped"]]
+        with st.expander(f"📏 Prompt Budget: ~{result['prompt_tokens']:,} tokens", expanded=bool(trimmed or truncated)):
+            st.dataframe([
+                {
+                    "Document": row["doc_type"],
+                    "Tokens Sent": f"{row['tokens_kept']:,} of {row['tokens_total']:,}",
+                    "Sections Left Out": row["sections_dropped"],
+                    "Whole Pages Left Out": ", ".join(map(str, row["pages_dropped"])) or "—",
+                }
+                for row in budget_report
+            ], hide_index=True)
+            for row in trimmed:
+                st.caption(
+                    f"**{row['doc_type']}** was too long to send in full. Consent, data and "
+                    f"prohibited-topic sections were kept first; left out: {'; '.join(row['headings_dropped'][:8])}"
+                )
+            show_truncated(truncated)
+
+    revision = result["revision"]
+    if revision is not None:
+        changed = [row for row in revision["changes"] if row["state"] != "unchanged"]
+        changed_label = f"{len(changed)} document(s) changed" if changed else "no changes"
+        with st.expander(f"🧩 Revision: {changed_label} since your last review"):
+            st.dataframe([
+                {
+                    "Document": row["doc_type"],
+                    "Change": row["state"],
+                    "Sections Re-Reviewed": len(row["changed"]),
+                    "Sections Removed": "; ".join(row["removed"]) or "—",
+                    "Tokens Sent": f"{row['tokens_changed']:,} of {row['tokens_total']:,}",
+                }
+                for row in revision["changes"]
+            ], hide_index=True)
+            st.caption("Only changed sections and your open action steps are re-checked. Tick **Force fresh AI review** for a full review.")
 
 # ==========================================
 # MODE A: AP RESEARCH STUDENT
@@ -155,71 +423,7 @@ if user_mode == "AP Research Student":
     
     # --- WORKFLOW GRAPHIC ---
     with st.expander("🗺️ View Research Workflow Map"):
-        st.graphviz_chart("""
-        digraph {
-            rankdir=TB;
-            node [shape=box, style="filled,rounded", fontname="Sans-Serif"];
-            
-            # Colors
-            node [fillcolor="#e1f5fe" color="#01579b"]; # Student Blue
-            
-            # Phase 1
-            subgraph cluster_0 {
-                label = "Phase 1: Development";
-                style=dashed; color=grey;
-                Draft [label="📝 Draft Proposal"];
-                Inst [label="Create Instruments"];
-                Draft -> Inst;
-            }
-
-            # Phase 2
-            subgraph cluster_1 {
-                label = "Phase 2: AI Compliance Check";
-                style=filled; color="#e8f5e9";
-                
-                node [fillcolor="#c8e6c9" color="#2e7d32"]; # AI Green
-                Upload [label="🚀 Upload to AI Portal"];
-                Check [label="⚠️ AI Review"];
-                Pass [label="✅ Clean Bill of Health"];
-                Fail [label="❌ Revision Needed"];
-                
-                Inst -> Upload;
-                Upload -> Check;
-                Check -> Pass;
-                Check -> Fail;
-                Fail -> Upload [label="Fix & Re-upload"];
-            }
-
-            # Phase 3
-            subgraph cluster_2 {
-                label = "Phase 3: School IRB Approval";
-                style=filled; color="#fff9c4";
-                
-                node [fillcolor="#fff59d" color="#fbc02d"]; # School Yellow
-                Submit [label="📧 Submit to School IRB"];
-                Review [label="School Committee Review"];
-                Approve [label="📜 Approval Letter"];
-                
-                Pass -> Submit;
-                Submit -> Review;
-                Review -> Approve;
-                Review -> Fail [label="Denied"];
-            }
-
-            # Phase 4
-            subgraph cluster_3 {
-                label = "Phase 4: Implementation";
-                style=filled; color="#f3e5f5";
-                
-                node [fillcolor="#e1bee7" color="#7b1fa2"]; # School Purple
-                Principal [label="📍 Contact Principal"];
-                Start [label="📊 Begin Data Collection"];
-                
-                Approve -> Principal;
-                Principal -> Start [label="Site Permission"];
-            }
-        }
-        """)
+        st.graphviz_chart(WORKFLOW_DOT)
     
     st.markdown("**For BCS Students:** Screen your research documents against **Policy 6.4001** and **AP Ethics Standards**.&nbsp; Check the sidebar resource to **confirm file-naming standards** for each of your files.")
 
@@ -236,7 +440,7 @@ if user_mode == "AP Research Student":
     if "Research Proposal" in selected_docs:
         st.markdown("### 1. Research Proposal")
         file = st.file_uploader("Upload Proposal (PDF)", type="pdf", key="ap_prop")
-        if file: student_inputs["PROPOSAL"] = extract_text(file)
+        if file: student_inputs["PROPOSAL"] = file
 
     if "Survey / Interview Questions" in selected_docs:
         st.markdown("### 2. Survey or Interview Script")
@@ -248,49 +452,20 @@ if user_mode == "AP Research Student":
             if text: student_inputs["SURVEY"] = text
         else:
             file = st.file_uploader("Upload Survey PDF", type="pdf", key="ap_survey_file")
-            if file: student_inputs["SURVEY"] = extract_text(file)
+            if file: student_inputs["SURVEY"] = file
 
     if "Participant Consent Forms (Parent or Adult)" in selected_docs:
         st.markdown("### 3. Participant Consent Forms")
         st.caption("Upload Parent Permission (for Minors) OR Adult Consent (for 18+).")
         file = st.file_uploader("Upload Consent PDF", type="pdf", key="ap_consent")
-        if file: student_inputs["CONSENT_FORMS"] = extract_text(file)
+        if file: student_inputs["CONSENT_FORMS"] = file
 
     if "Principal/District Permission Forms" in selected_docs:
         st.markdown("### 4. Principal/District Permission Forms")
         file = st.file_uploader("Upload Permission Form (PDF)", type="pdf", key="ap_perm")
-        if file: student_inputs["PERMISSION_FORM"] = extract_text(file)
+        if file: student_inputs["PERMISSION_FORM"] = file
 
-    # --- SYSTEM PROMPT (STUDENT) ---
-    system_prompt = """
-    ROLE: AP Research IRB Compliance Officer.
-    
-    INSTRUCTION: Review the student proposal for compliance with Policy 6.4001.
-    
-    **REVIEW STRATEGY:**
-    1. **SUBJECT TRIAGE:** Determine if the participants are **MINORS** (Students <18) or **ADULTS** (Teachers/Community 18+).
-       - IF MINORS: Check for "Parent Permission Form".
-       - IF ADULTS: Check for "Adult Informed Consent Form" (Do NOT ask for Parent Permission).
-    2. **COMPREHENSIVE SCAN:** Identify all compliance gaps.
-    3. **EDUCATIONAL RATIONALE:** For each Action Step, explain **WHY** citing Policy 6.4001, FERPA, or Ethics.
-    
-    **STRICT CONSTRAINTS:** 1. Do NOT rewrite the student's text.
-    2. **SCOPE LIMITATION:** Do NOT critique grammar or research quality. Focus ONLY on regulatory compliance.
-    
-    **CRITERIA (Policy 6.4001 & Federal Rules):**
-    1. PROHIBITED: Political affiliation, voting history, religious practices, firearm ownership. (Strict Fail).
-    2. CONSENT (Select One based on Subject Age):
-       - **Minors:** Requires Active Parent Permission + Student Assent.
-       - **Adults:** Requires Adult Informed Consent (Voluntary participation statement).
-    3. DATA: Must have destruction date and method.
-    
-    **OUTPUT FORMAT:**
-    - STATUS: [✅ PASS] or [❌ REVISION NEEDED]
-    - ACTION PLAN & RATIONALE:
-      * **[Action Step 1]:** [Clear instruction to fix missing items]
-        * *Rationale:* "[Brief explanation citing Policy/Law]"
-      * **[Action Step 2]:** ...
-    """
+    system_prompt = STUDENT_PROMPT
 
 # ==========================================
 # MODE B: EXTERNAL / HIGHER ED RESEARCHER
@@ -312,59 +487,38 @@ else:
         st.caption("Purpose, Methodology, Benefit, Logistics.")
         prop_files = st.file_uploader("Upload Full Proposal (PDFs)", type="pdf", key="ext_prop", accept_multiple_files=True)
         if prop_files:
-            combined_text = ""
-            for f in prop_files:
-                combined_text += extract_text(f) + "\n\n"
-            external_inputs["FULL_PROPOSAL"] = combined_text
+            external_inputs["FULL_PROPOSAL"] = prop_files
 
     with col2:
         st.markdown("### 2. Instruments & Consents")
         st.caption("Surveys, Protocols, Consent Forms.")
         inst_files = st.file_uploader("Upload Instruments (PDFs)", type="pdf", key="ext_inst", accept_multiple_files=True)
         if inst_files:
-            combined_text = ""
-            for f in inst_files:
-                combined_text += extract_text(f) + "\n\n"
-            external_inputs["INSTRUMENTS"] = combined_text
-
-    # --- SYSTEM PROMPT (EXTERNAL - UNIFIED + TRIAGE) ---
-    system_prompt = """
-    ROLE: Research Committee Reviewer for Blount County Schools (BCS).
-    TASK: Analyze the external research proposal against District "Regulations and Procedures for Conducting Research Studies" and Board Policy 6.4001.
-
-    **REVIEW STRATEGY:**
-    1. **SUBJECT TRIAGE:** Determine if the participants are **MINORS** (Students <18) or **ADULTS** (Teachers/Staff).
-       - IF MINORS: Check for "Parent Permission Form".
-       - IF ADULTS: Check for "Adult Informed Consent Form" (Do NOT ask for Parent Permission).
-    2. **COMPREHENSIVE SCAN:** Identify all compliance gaps in one go.
-    3. **EDUCATIONAL RATIONALE:** For each Action Step, you must explain **WHY** the revision is needed by citing Policy 6.4001, FERPA, or the District Research Rubric.
-
-    **STRICT CONSTRAINTS:**
-    1. Do not provide specific rewrite examples or sample verbiage. 
-    2. **SCOPE LIMITATION:** Do NOT critique grammar or research quality (e.g., sample size, typos). Focus ONLY on regulatory compliance (Policy 6.4001, Federal Rules, Ethics).
-
-    CRITICAL COMPLIANCE CHECKS:
-    1. BENEFIT TO DISTRICT: Must explicitly state "projected value of the study to Blount County."
-    2. BURDEN: Must not interfere with instructional time. No "Convenience Sampling."
-    3. PROHIBITED TOPICS (Strict Ban): Political affiliation, Voting, Religion, Firearms.
-    4. SENSITIVE TOPICS: Mental health, sex, illegal acts, income -> Requires Written Active Consent.
-    5. MANDATORY STATEMENTS: Agreement to Policy 6.4001, Voluntary statement, Right to inspect, Anonymity.
-
-    OUTPUT FORMAT:
-    - STATUS: [✅ RECOMMEND FOR REVIEW] or [❌ REVISION NEEDED]
-    - ACTION PLAN & RATIONALE:
-      * **[Action Step 1]:** [Clear instruction to fix missing items]
-        * *Rationale:* "[Brief explanation citing Policy 6.4001/Federal Law]"
-      * **[Action Step 2]:** ...
-    """
+            external_inputs["INSTRUMENTS"] = inst_files
+
+    system_prompt = EXTERNAL_PROMPT
     
     student_inputs = external_inputs
 
 # ==========================================
 # EXECUTION LOGIC
 # ==========================================
+# Render the review as Gemini writes it instead of after the full response.
+STREAM_RESPONSES = os.environ.get("BCS_STREAM_RESPONSES", "1") != "0"
+
+# Answer obvious strict fails (e.g. a survey question about firearms) locally.
+PRESCREEN_SHORT_CIRCUIT = os.environ.get("BCS_PRESCREEN_SHORT_CIRCUIT", "1") != "0"
+
+# Ask Gemini for a JSON review (checker/structured.py) and render it here; not streamed.
+STRUCTURED_OUTPUT = os.environ.get("BCS_STRUCTURED_OUTPUT", "0") == "1"
+
+force_fresh = st.checkbox(
+    "🔄 Force fresh AI review",
+    help="Ignore any saved result and the instant pre-screen for these exact files and ask Gemini again."
+)
+
 if st.button("Run Compliance Check"):
-    if not api_key:
+    if not api_key and key_scheduler is None:
         st.error("⚠️ Please enter a Google API Key in the sidebar.")
     elif not student_inputs:
         st.warning("Please upload at least one document.")
@@ -372,68 +526,108 @@ if st.button("Run Compliance Check"):
         # 1. SETUP
         status = st.empty() 
         status.info("🔌 Connecting to AI Services...")
-        genai.configure(api_key=api_key)
+        trace = RequestTrace(EXTERNAL if user_mode != "AP Research Student" else STUDENT,
+                             session_id=get_script_run_ctx().session_id)
         
-        # 2. CONFIGURATION
-        generation_config = {
-            "temperature": 0.3, 
-            "top_p": 0.95, 
-            "top_k": 40, 
-            "max_output_tokens": 8192
-        }
-        
-        safety_settings = [
-            {"category": "HARM_CATEGORY_HARASSMENT", "threshold": "BLOCK_ONLY_HIGH"},
-            {"category": "HARM_CATEGORY_HATE_SPEECH", "threshold": "BLOCK_ONLY_HIGH"},
-            {"category": "HARM_CATEGORY_SEXUALLY_EXPLICIT", "threshold": "BLOCK_ONLY_HIGH"},
-            {"category": "HARM_CATEGORY_DANGEROUS_CONTENT", "threshold": "BLOCK_ONLY_HIGH"},
-        ]
-
-        # 3. PREPARING TEXT
-        status.info("📄 Reading your PDF files...")
-        user_message = f"{system_prompt}\n\nAnalyze the following documents:\n"
-        
-        total_chars = 0
-        for doc_type, content in student_inputs.items():
-            clean_content = str(content)[:40000]
-            total_chars += len(clean_content)
-            user_message += f"\n--- {doc_type} ---\n{clean_content}\n" 
-        
-        status.info(f"📤 Sending {total_chars} characters to Gemini AI...")
-
-        # 4. MODEL SELECTOR
-        target_models = [
-            "gemini-2.5-flash-lite",      # 🥇 Confirmed in your list
-            "gemini-flash-lite-latest",   # 🥈 Alias for the above
-            "gemini-2.0-flash-lite",      # 🥉 Fallback Lite model
-            "gemini-2.5-flash"            # 🚨 LAST RESORT (Low 20/day limit)
-        ]
-
-        response = None
-        success = False
-        connected_model = ""
-
-        with st.spinner("🤖 Connecting..."):
-            for model_name in target_models:
-                try:
-                    model = genai.GenerativeModel(
-                        model_name=model_name, 
-                        generation_config=generation_config, 
-                        safety_settings=safety_settings
-                    )
-                    response = model.generate_content(user_message)
-                    success = True
-                    connected_model = model_name
-                    break 
-                except Exception as e:
-                    continue
+        # 2. MEMORY: reserve this review's working set (see checker/memory.py), plus
+        # the earlier reviews this session keeps for re-review (checker/revisions.py).
+        review_history = st.session_state.setdefault(
+            "review_history", ReviewHistory(max_bytes=get_memory_budget().session_bytes // 4)
+        )
+        memory_estimate = estimate_input_bytes(student_inputs) + review_history.held_bytes()
+        with hold_memory(memory_estimate, status) as memory_wait:
+            if memory_wait > 0.05:
+                trace.add_stage("memory", memory_wait)
+
+            # 3. PREPARING TEXT
+            status.info("📄 Reading your PDF files...")
+            with trace.stage("extract"):
+                files_by_type = read_documents(student_inputs, status, on_file=trace.file)
+            truncated = [f for f in trace.files if not f["complete"]]
+
+            # 4. REVIEW (see checker/review.py): pre-screen, prompt budget, saved
+            # results, revisions, large packets, the review queue and the models.
+            panels = st.container()
+            panels_shown = []
+            result_area = st.empty()
+
+            def show_result(text):
+                with result_area.container():
+                    st.markdown("---")
+                    st.markdown(text)
+
+            def show_plan(result):
+                # Called once the prompt is ready, so the flags show while the model works.
+                with panels:
+                    show_review_panels(result, truncated)
+                panels_shown.append(True)
+
+            def show_stream(model_name, text):
+                if not text:
+                    result_area.empty()  # A new attempt; a failed stream is cleared.
+                    return
+                status.info(f"✍️ Writing your review ({model_name})...")
+                show_result(text + " ▌")
+
+            def show_queue_position(position, eta_seconds):
+                status.info(
+                    f"⏳ Your review is #{position} in line (about {max(1, round(eta_seconds / 60))} min). "
+                    "Please keep this tab open..."
+                )
+
+            result = review_documents(
+                files_by_type, trace.mode, get_token_estimator(), get_rule_engine(), get_client_pool(),
+                key_scheduler=key_scheduler,
+                api_key=api_key,
+                health=get_model_health(),
+                response_cache=get_response_cache(),
+                force_fresh=force_fresh,
+                short_circuit=PRESCREEN_SHORT_CIRCUIT,
+                on_status=lambda message: status.info(f"🤖 {message}..."),
+                history=review_history,
+                structured=STRUCTURED_OUTPUT,
+                # The district keys are shared by every session, so calls on them wait their turn.
+                admission=get_admission_queue(len(key_scheduler)) if key_scheduler is not None else None,
+                session_id=get_script_run_ctx().session_id,
+                on_wait=show_queue_position,
+                on_stream=show_stream if STREAM_RESPONSES else None,
+                on_prepared=show_plan,
+                trace=trace,
+            )
+            if not panels_shown:
+                show_plan(result)
+            del files_by_type
+
+            session_peak = max(st.session_state.get("memory_peak", 0), result["held_bytes"])
+            st.session_state["memory_peak"] = session_peak
+            trace.record_memory(
+                reserved_bytes=memory_estimate, held_bytes=result["held_bytes"], session_peak_bytes=session_peak,
+                **process_memory(),
+            )
+            trace.finish(source=result["source"], outcome="success" if result["ok"] else "failed")
+            get_metrics().record(trace)
 
         # 5. DISPLAY RESULTS
-        if success and response:
-            st.toast(f"✅ Connected to: {connected_model}", icon="⚡")
+        source = result["source"]
+        revision = result["revision"]
+        if result["ok"] and result["text"]:
+            if source == "prescreen":
+                st.toast("🔎 Prohibited question found by the instant pre-screen", icon="⚡")
+            elif source == "cache":
+                st.toast(f"♻️ Loaded saved review from: {result['model']}", icon="⚡")
+            elif revision is not None and revision["unchanged"]:
+                st.toast("♻️ No changes since your last review", icon="⚡")
+            elif source == "revision":
+                st.toast(f"🧩 Re-reviewed your changes with: {result['model']}", icon="⚡")
+            else:
+                st.toast(f"✅ Connected to: {result['model']}", icon="⚡")
             status.success("✅ Analysis Complete!")
-            st.markdown("---")
-            st.markdown(response.text)
+            show_result(result["text"])
+            if result["review"] is not None:
+                st.download_button(
+                    "⬇️ Download Findings (JSON)", json.dumps(result["review"], indent=2, ensure_ascii=False),
+                    file_name=f"review-findings-{trace.id}.json", mime="application/json",
+                )
             
             # --- CONDITIONAL NEXT STEPS ---
             st.markdown("---")
@@ -465,7 +659,67 @@ if st.button("Run Compliance Check"):
                 """)
         else:
             status.error("❌ Connection Failed")
-            st.error("""
-            **All models failed.** Please check your Quota usage at https://ai.google.dev/usage. 
-            You may need to create a new API Key if your daily limit is reached.
-            """)
+            failed_attempts = result["attempts"]
+            failed_kinds = {kind for _, kind, _ in failed_attempts}
+            if failed_kinds == {INVALID_KEY}:
+                st.error("**API key rejected.** Please check that the key in the sidebar was copied correctly.")
+            elif SAFETY in failed_kinds:
+                st.error("**The AI safety filter blocked this review.** Remove any sensitive sample content from your documents and try again.")
+            else:
+                st.error("""
+                **All models failed.** Please check your Quota usage at https://ai.google.dev/usage. 
+                You may need to create a new API Key if your daily limit is reached.
+                """)
+            if failed_attempts:
+                st.caption("Attempts: " + ", ".join(f"{model} ({kind})" for model, kind, _ in failed_attempts))
+
+        # --- REQUEST METRICS ---
+        trace_row = trace.to_dict(file_names=True)
+        with st.expander(f"⏱️ Request Metrics: {trace_row['total_seconds']:.1f}s"):
+            st.dataframe([
+                {"Stage": stage, "Seconds": seconds} for stage, seconds in trace_row["stages"].items()
+            ], hide_index=True)
+            if trace_row["files"]:
+                st.dataframe([
+                    {
+                        "File": f["name"],
+                        "Pages": f["pages"],
+                        "Characters": f["chars"],
+                        "Read In Full": "Yes" if f["complete"] else "No (character limit)",
+                        "Seconds": "cached" if f["cached"] else f["seconds"],
+                    }
+                    for f in trace_row["files"]
+                ], hide_index=True)
+            if trace_row["attempts"]:
+                st.dataframe([
+                    {"Phase": a["phase"], "Model": a["model"], "Seconds": a["seconds"], "Result": a["result"]}
+                    for a in trace_row["attempts"]
+                ], hide_index=True)
+            st.caption(
+                f"Prompt: {trace_row['prompt_chars']:,} characters (~{trace_row['prompt_tokens_estimated']:,} tokens estimated"
+                f", {trace_row['prompt_tokens']:,} reported) · Output: {trace_row['output_tokens']:,} tokens"
+            )
+            memory = trace_row["memory"]
+            st.caption(
+                f"Memory: {memory['held_bytes'] / 2**20:.1f} MB of text held at peak "
+                f"(~{memory['reserved_bytes'] / 2**20:.0f} MB reserved) · "
+                f"your session's peak {memory['session_peak_bytes'] / 2**20:.1f} MB · "
+                f"server {(memory['rss_bytes'] or memory['peak_rss_bytes']) / 2**20:.0f} MB resident"
+            )
+            st.download_button(
+                "Download as JSON", json.dumps(trace_row, indent=2),
+                file_name=f"review-metrics-{trace_row['id']}.json", mime="application/json",
+            )
+
+        # --- SESSION HISTORY ---
+        history_rows = review_history.rows()
+        if len(history_rows) > 1:
+            with st.expander(f"🕘 Your Reviews This Session ({len(history_rows)})"):
+                st.dataframe([
+                    {"Time": row["time"], "Documents": row["documents"], "Status": row["status"],
+                     "Source": row["source"], "Model": row["model"]}
+                    for row in reversed(history_rows)
+                ], hide_index=True)
+
+# Everything above has been sent to the browser; warm up the SDK for the first review.
+preload_sdk()
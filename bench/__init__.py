@@ -0,0 +1 @@
+"""Benchmarks for the review pipeline; run with ``python -m bench.run``."""
@@ -0,0 +1,105 @@
+"""Synthetic research packets for the benchmarks.
+
+Proposals, surveys and consent forms are built from the section headings and
+statements the review actually looks for, padded with filler paragraphs to
+the requested page count. Everything is seeded, so a given ``(kind, pages,
+seed)`` always produces the same PDF.
+"""
+import random
+
+from fpdf import FPDF
+
+WORDS = (
+    "students teachers classroom learning outcomes study participants data analysis "
+    "school district research methods results instruction engagement attendance "
+    "motivation assessment reading mathematics science writing collaboration "
+    "technology feedback practice growth semester survey interview observation"
+).split()
+
+PROPOSAL_SECTIONS = [
+    ("PURPOSE OF THE STUDY", "This study examines how {topic} relates to student engagement in grades 9-12."),
+    ("RESEARCH QUESTIONS", "How does {topic} influence weekly study habits among high school students?"),
+    ("METHODOLOGY", "Participants complete an anonymous online survey of fifteen items during advisory period."),
+    ("PARTICIPANTS", "Approximately 120 students aged 14-18 will be invited; participation is voluntary."),
+    ("INFORMED CONSENT", "Active parent permission and student assent are collected before any data is gathered."),
+    ("DATA MANAGEMENT", "Responses are stored on an encrypted drive and will be destroyed by shredding on June 1, 2027."),
+    ("BENEFIT TO THE DISTRICT", "The projected value of the study to Blount County Schools is better advisory planning."),
+    ("RISKS", "Risks are minimal; participants may skip any question or withdraw at any time."),
+]
+
+SURVEY_QUESTIONS = [
+    "How many hours per week do you spend on homework?",
+    "How often do you use {topic} outside of class?",
+    "On a scale of 1-5, how confident do you feel about upcoming exams?",
+    "Which subject do you find most engaging, and why?",
+    "How many nights per week do you get at least eight hours of sleep?",
+    "Describe one strategy that helps you stay focused while studying.",
+]
+
+CONSENT_PARAGRAPHS = [
+    "Your child is invited to take part in a research study about {topic}.",
+    "Participation is voluntary and your child may withdraw at any time without penalty.",
+    "No names will be collected; all responses are anonymous and kept confidential.",
+    "All data will be destroyed on June 1, 2027.",
+    "You may inspect the survey instrument before giving permission.",
+    "Parent / Guardian Signature: ____________________   Date: __________",
+]
+
+TOPICS = ["social media use", "part-time employment", "extracurricular activities", "sleep schedules", "music practice"]
+
+KINDS = ("proposal", "survey", "consent")
+
+
+def _filler(rng, sentences):
+    text = []
+    for _ in range(sentences):
+        words = [rng.choice(WORDS) for _ in range(rng.randint(8, 18))]
+        text.append(" ".join(words).capitalize() + ".")
+    return " ".join(text)
+
+
+def _body(kind, rng, topic):
+    """Yield ``(heading, paragraph)`` pairs for one page's worth of content."""
+    if kind == "proposal":
+        for heading, statement in PROPOSAL_SECTIONS:
+            yield heading, statement.format(topic=topic) + " " + _filler(rng, 4)
+    elif kind == "survey":
+        yield "SURVEY INSTRUMENT", "Please answer each question honestly. You may skip any question."
+        for number, question in enumerate(SURVEY_QUESTIONS, start=1):
+            yield None, f"{number}. {question.format(topic=topic)}  ______________________"
+    else:
+        yield "PARENT PERMISSION FORM", CONSENT_PARAGRAPHS[0].format(topic=topic)
+        for paragraph in CONSENT_PARAGRAPHS[1:]:
+            yield None, paragraph + " " + _filler(rng, 2)
+
+
+def make_pdf(kind, pages, seed=0):
+    """Return the bytes of a ``pages``-page PDF of the given ``kind``."""
+    if kind not in KINDS:
+        raise ValueError(f"kind must be one of {KINDS}")
+    rng = random.Random(f"{kind}-{pages}-{seed}")
+    topic = rng.choice(TOPICS)
+    pdf = FPDF()
+    pdf.set_auto_page_break(False)
+    for page in range(1, pages + 1):
+        pdf.add_page()
+        pdf.set_font("Arial", "B", 12)
+        pdf.cell(0, 8, f"{kind.title()} - page {page} of {pages}", ln=1)
+        for heading, paragraph in _body(kind, rng, topic):
+            if pdf.get_y() > 250:
+                break
+            if heading:
+                pdf.set_font("Arial", "B", 11)
+                pdf.cell(0, 7, heading, ln=1)
+            pdf.set_font("Arial", size=10)
+            pdf.multi_cell(0, 5, paragraph)
+    return pdf.output(dest="S").encode("latin-1")
+
+
+def make_packet(pages, seed=0):
+    """A student packet: ``{doc_type: (file name, pdf bytes)}`` with a ``pages``-page proposal."""
+    return {
+        "PROPOSAL": ("Student, Test - Research Proposal.pdf", make_pdf("proposal", pages, seed)),
+        "SURVEY": ("Student, Test - Survey - Interview Questions.pdf", make_pdf("survey", max(1, pages // 10), seed)),
+        "CONSENT_FORMS": ("Student, Test - Parent Permission Form.pdf", make_pdf("consent", 2, seed)),
+    }
@@ -0,0 +1,282 @@
+"""Benchmarks for the review pipeline.
+
+    python -m bench.run                       # everything, default sizes
+    python -m bench.run --scenarios review --students 60 --quota-rate 0.1
+    python -m bench.run --scenarios review --structured   # JSON reviews
+    python -m bench.run --output bench_output.txt --json bench.json
+
+Scenarios:
+
+- ``extract``: ``extract_pdf_text`` on synthetic proposals of 1-200 pages,
+  from bytes in memory and from a spooled, memory-mapped file (PdfSource).
+- ``prompt``: pre-screen, token budget and prompt assembly on the extracted text.
+- ``review``: a class of students pressing "Run Compliance Check" at once:
+  extraction, then ``review_documents`` with the portal's hooks (admission
+  queue, request trace, streamed answer), the key pool and the model
+  fallback chain, against a local stub of the Gemini API.
+
+Each row reports p50/p95/p99 latency, throughput and the peak Python heap
+(tracemalloc). tracemalloc slows pure-Python code several times over, so
+every scenario takes its timings untraced and measures the heap in one
+extra traced run; the process's peak RSS is printed last.
+"""
+import argparse
+import importlib
+import json
+import resource
+import os
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+import warnings
+from concurrent.futures import ThreadPoolExecutor
+
+from bench.corpus import make_packet, make_pdf
+from bench.stub_gemini import StubGemini
+from checker.admission import AdmissionQueue
+from checker.budgeting import TokenEstimator, budget_documents
+from checker.caching import ContentCache
+from checker.clients import ClientPool
+from checker.extraction import ExtractionPool, extract_documents, extract_pdf_text
+from checker.health import ModelHealth
+from checker.keys import KeyScheduler
+from checker.metrics import RequestTrace
+from checker.prompts import STUDENT_PROMPT
+from checker.review import FILE_CHAR_LIMIT, build_user_message, document_token_budget, join_documents, review_documents
+from checker.rules import STUDENT, RuleEngine, hints_for_model
+from checker.uploads import PdfSource
+
+
+def percentile(samples, pct):
+    """Nearest-rank percentile of ``samples``."""
+    ordered = sorted(samples)
+    if not ordered:
+        return 0.0
+    rank = max(1, -(-len(ordered) * pct // 100))
+    return ordered[int(rank) - 1]
+
+
+class Measurement:
+    """Latency samples plus wall time and (if ``trace``) peak heap for one benchmark row."""
+
+    def __init__(self, name, unit="op", trace=True):
+        self.name = name
+        self.unit = unit
+        self.samples = []
+        self.work = 0
+        self.failures = 0
+        self.wall = 0.0
+        self.peak_bytes = 0
+        self.notes = ""
+        self.trace = trace
+
+    def __enter__(self):
+        if self.trace:
+            tracemalloc.start()
+        self._started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.wall = time.perf_counter() - self._started
+        if self.trace:
+            self.peak_bytes = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+
+    def trace_once(self, fn):
+        """Record the peak heap of one extra, untimed call to ``fn``."""
+        tracemalloc.start()
+        try:
+            fn()
+            self.peak_bytes = max(self.peak_bytes, tracemalloc.get_traced_memory()[1])
+        finally:
+            tracemalloc.stop()
+
+    def row(self):
+        return {
+            "scenario": self.name,
+            "n": len(self.samples),
+            "failures": self.failures,
+            "p50_ms": round(percentile(self.samples, 50) * 1000, 1),
+            "p95_ms": round(percentile(self.samples, 95) * 1000, 1),
+            "p99_ms": round(percentile(self.samples, 99) * 1000, 1),
+            "throughput": round(self.work / self.wall, 2) if self.wall else 0.0,
+            "unit": f"{self.unit}/s",
+            "peak_heap_mb": round(self.peak_bytes / 2**20, 1),
+            "notes": self.notes,
+        }
+
+
+# --- SCENARIOS ---
+def bench_extract(pages_list, repeat):
+    rows = []
+    for pages in pages_list:
+        data = make_pdf("proposal", pages)
+        with tempfile.NamedTemporaryFile(suffix=".pdf", delete=False) as f:
+            f.write(data)
+        for label, pdf in (("bytes", data), ("mmap", PdfSource.from_path(f.name))):
+            with Measurement(f"extract {pages}p ({label})", unit="page", trace=False) as m:
+                for _ in range(repeat):
+                    started = time.perf_counter()
+                    extract_pdf_text(pdf, FILE_CHAR_LIMIT)
+                    m.samples.append(time.perf_counter() - started)
+                    m.work += pages
+            m.trace_once(lambda: extract_pdf_text(pdf, FILE_CHAR_LIMIT))
+            m.notes = f"{len(data) // 1024} KB PDF"
+            rows.append(m.row())
+        os.remove(f.name)
+    return rows
+
+
+def bench_prompt(pages_list, repeat):
+    rows = []
+    rule_engine = RuleEngine()
+    for pages in pages_list:
+        packet = make_packet(pages)
+        files_by_type = {
+            doc_type: [(name, extract_pdf_text(data, FILE_CHAR_LIMIT)[0])]
+            for doc_type, (name, data) in packet.items()
+        }
+        documents = join_documents(files_by_type)
+
+        def assemble():
+            estimator = TokenEstimator()
+            hints = hints_for_model(rule_engine.scan(documents, STUDENT))
+            budget = document_token_budget(STUDENT_PROMPT, estimator)
+            fitted, _ = budget_documents(documents, budget, estimator)
+            return estimator, build_user_message(STUDENT_PROMPT, fitted, hints)
+
+        with Measurement(f"prompt {pages}p", unit="prompt", trace=False) as m:
+            for _ in range(repeat):
+                started = time.perf_counter()
+                estimator, message = assemble()
+                m.samples.append(time.perf_counter() - started)
+                m.work += 1
+        m.trace_once(assemble)
+        m.notes = f"{sum(map(len, documents.values())) // 1000}k chars -> ~{estimator.count(message):,} tokens"
+        rows.append(m.row())
+    return rows
+
+
+def bench_review(args):
+    """Every student presses the button at once; latency includes queueing.
+
+    Timed untraced, like extract and prompt; the peak heap comes from one
+    more run of the whole class under tracemalloc, with fresh caches, key
+    pool and queue so it does the same work.
+    """
+    packets = [make_packet(args.review_pages, seed=student) for student in range(args.students)]
+    keys = [f"bench-key-{n}" for n in range(args.keys)]
+    pool = ExtractionPool()
+    # The portal's pool is long-lived and it preloads the SDK; do both before the clock starts.
+    pool.map([make_pdf("proposal", 1)] * pool.max_workers)
+    importlib.import_module("google.generativeai")
+    stub = StubGemini(latency=(args.latency, args.jitter), quota_rate=args.quota_rate)
+    clients = ClientPool(**stub.client_config())
+
+    def run_class():
+        key_scheduler = KeyScheduler(keys, rpm=args.key_rpm, rpd=10**6)
+        queue = AdmissionQueue(len(keys))
+        health = ModelHealth()
+        estimator = TokenEstimator()
+        rule_engine = RuleEngine()
+        text_cache = ContentCache()
+        start_line = threading.Barrier(args.students)
+
+        def student(index):
+            packet = packets[index]
+            start_line.wait()
+            started = time.perf_counter()
+            texts = extract_documents(list(packet.values()), text_cache, pool=pool, char_budget=FILE_CHAR_LIMIT)
+            files_by_type = {doc_type: [(name, text)] for (doc_type, (name, _)), text in zip(packet.items(), texts)}
+            # As the portal calls it: queued, traced and (unless structured) streamed.
+            result = review_documents(
+                files_by_type, STUDENT, estimator, rule_engine, clients,
+                key_scheduler=key_scheduler, health=health, structured=args.structured,
+                admission=queue, session_id=f"session-{index}",
+                on_stream=lambda model_name, text: None, trace=RequestTrace(STUDENT),
+            )
+            return time.perf_counter() - started, result["ok"]
+
+        with ThreadPoolExecutor(max_workers=args.students) as executor:
+            return list(executor.map(student, range(args.students)))
+
+    with stub:
+        with Measurement(f"review x{args.students} ({args.review_pages}p)", unit="review", trace=False) as m:
+            for seconds, ok in run_class():
+                m.samples.append(seconds)
+                m.work += 1
+                m.failures += not ok
+        requests, quota_errors = stub.requests, stub.quota_errors
+        m.trace_once(run_class)
+    m.notes = (
+        f"{'structured, ' if args.structured else ''}"
+        f"{args.keys} keys @ {args.key_rpm} rpm, stub {args.latency}s±{args.jitter}s, "
+        f"{requests} requests, {quota_errors} x 429"
+    )
+    return [m.row()]
+
+
+# --- REPORT ---
+COLUMNS = ["scenario", "n", "failures", "p50_ms", "p95_ms", "p99_ms", "throughput", "unit", "peak_heap_mb", "notes"]
+
+
+def format_table(rows):
+    cells = [COLUMNS] + [[str(row[c]) for c in COLUMNS] for row in rows]
+    widths = [max(len(line[i]) for line in cells) for i in range(len(COLUMNS))]
+    return "\n".join("  ".join(cell.ljust(w) for cell, w in zip(line, widths)).rstrip() for line in cells)
+
+
+def peak_rss_mb():
+    # ru_maxrss is KB on Linux and bytes on macOS.
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / 2**20 if sys.platform == "darwin" else peak / 1024
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m bench.run", description=__doc__.split("\n\n")[0])
+    parser.add_argument("--scenarios", default="extract,prompt,review",
+                        help="Comma-separated subset of: extract, prompt, review.")
+    parser.add_argument("--pages", default="1,10,50,200", help="Proposal sizes for extract and prompt.")
+    parser.add_argument("--repeat", type=int, default=5, help="Runs per size for extract and prompt.")
+    parser.add_argument("--students", type=int, default=30, help="Simultaneous reviews in the review scenario.")
+    parser.add_argument("--review-pages", type=int, default=10, help="Proposal size in the review scenario.")
+    parser.add_argument("--keys", type=int, default=25, help="District keys in the pool.")
+    parser.add_argument("--key-rpm", type=int, default=15, help="Requests per minute per key.")
+    parser.add_argument("--latency", type=float, default=1.5, help="Mean stub response time in seconds.")
+    parser.add_argument("--jitter", type=float, default=0.5, help="Stub response time spread in seconds.")
+    parser.add_argument("--quota-rate", type=float, default=0.05, help="Share of stub requests answered with 429.")
+    parser.add_argument("--structured", action="store_true", help="Request JSON reviews in the review scenario.")
+    parser.add_argument("--output", help="Also write the table to this file (e.g. bench_output.txt).")
+    parser.add_argument("--json", help="Also write the rows as JSON to this file.")
+    args = parser.parse_args(argv)
+
+    warnings.filterwarnings("ignore", category=FutureWarning)
+    scenarios = [s.strip() for s in args.scenarios.split(",") if s.strip()]
+    pages_list = [int(p) for p in args.pages.split(",")]
+    rows = []
+    for scenario in scenarios:
+        print(f"Running {scenario}...", file=sys.stderr)
+        if scenario == "extract":
+            rows += bench_extract(pages_list, args.repeat)
+        elif scenario == "prompt":
+            rows += bench_prompt(pages_list, args.repeat)
+        elif scenario == "review":
+            rows += bench_review(args)
+        else:
+            parser.error(f"unknown scenario: {scenario}")
+
+    report = format_table(rows) + f"\n\nPeak RSS: {peak_rss_mb():.0f} MB\n"
+    print(report)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(report)
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump({"rows": rows, "peak_rss_mb": round(peak_rss_mb(), 1)}, f, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
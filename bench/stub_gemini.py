@@ -0,0 +1,136 @@
+"""A local stand-in for the Gemini REST API.
+
+Answers ``generateContent`` and ``streamGenerateContent`` with a canned
+review (as JSON when the request asks for structured output) after a
+configurable latency, and returns HTTP 429 for a configurable
+share of requests, so the fallback chain, key pool and queue can be
+exercised without spending quota.
+
+Pass ``ClientPool(**stub.client_config())`` to the review code to send its
+requests to the stub over REST.
+"""
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+REVIEW = (
+    "- STATUS: [❌ REVISION NEEDED]\n"
+    "- ACTION PLAN & RATIONALE:\n"
+    "  * **[Action Step 1]:** State how participants can withdraw from the study.\n"
+    "    * *Rationale:* \"Federal research ethics require voluntary participation.\"\n"
+)
+
+REVIEW_JSON = json.dumps({
+    "status": "REVISION NEEDED",
+    "subjects": "MINORS",
+    "action_steps": [{
+        "document": "CONSENT_FORMS",
+        "instruction": "State how participants can withdraw from the study.",
+        "rationale": "Federal research ethics require voluntary participation.",
+        "citations": ["Policy 6.4001"],
+    }],
+})
+
+
+class StubGemini:
+    """Threaded HTTP server; ``latency`` is ``(mean, jitter)`` seconds."""
+
+    def __init__(self, latency=(0.5, 0.2), quota_rate=0.0, stream_chunks=4, seed=0):
+        self.latency = latency
+        self.quota_rate = quota_rate
+        self.stream_chunks = stream_chunks
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.quota_errors = 0
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), self._handler())
+        self._server.daemon_threads = True
+        self._thread = None
+
+    @property
+    def url(self):
+        host, port = self._server.server_address
+        return f"http://{host}:{port}"
+
+    def client_config(self):
+        """ClientPool settings that route requests to this stub.
+
+        The REST transport of google-generativeai has no async client, so
+        ``generate_content_async`` (the map phase of large external packets)
+        cannot reach the stub.
+        """
+        return {"transport": "rest", "client_options": {"api_endpoint": self.url}}
+
+    def __enter__(self):
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def _draw(self):
+        with self._lock:
+            self.requests += 1
+            throttled = self._rng.random() < self.quota_rate
+            if throttled:
+                self.quota_errors += 1
+            mean, jitter = self.latency
+            delay = max(0.0, self._rng.uniform(mean - jitter, mean + jitter))
+        return throttled, delay
+
+    def _handler(self):
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, *args):
+                pass
+
+            def _send(self, status, payload):
+                data = json.dumps(payload).encode()
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def do_POST(self):
+                body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+                throttled, delay = stub._draw()
+                if throttled:
+                    # Quota errors come back fast, as they do from the real API.
+                    self._send(429, {"error": {
+                        "code": 429,
+                        "message": "Resource has been exhausted (e.g. check quota).",
+                        "status": "RESOURCE_EXHAUSTED",
+                    }})
+                    return
+                time.sleep(delay)
+                config = json.loads(body or b"{}").get("generationConfig", {})
+                review = REVIEW_JSON if config.get("responseMimeType") == "application/json" else REVIEW
+                usage = {"promptTokenCount": max(1, len(body) // 4), "candidatesTokenCount": len(review) // 4}
+                if ":streamGenerateContent" in self.path:
+                    size = -(-len(review) // stub.stream_chunks)
+                    pieces = [review[i:i + size] for i in range(0, len(review), size)]
+                    self._send(200, [_response(piece, usage) for piece in pieces])
+                else:
+                    self._send(200, _response(review, usage))
+
+        return Handler
+
+
+def _response(text, usage):
+    return {
+        "candidates": [{
+            "content": {"parts": [{"text": text}], "role": "model"},
+            "finishReason": "STOP",
+            "index": 0,
+        }],
+        "usageMetadata": dict(usage, totalTokenCount=sum(usage.values())),
+    }
+
@@ -0,0 +1 @@
+"""Shared helpers for the BCS Research Review Portal (app.py) and the bulk-screening CLI (checker.bulk)."""
@@ -0,0 +1,125 @@
+"""Process-wide admission queue for Gemini reviews.
+
+When a whole class presses "Run Compliance Check" at once, only as many
+reviews run as the district key pool can serve; the rest wait their turn
+instead of all failing on quota together. Waiting jobs are admitted round by
+round across sessions, so a session that submits again before its last job
+finished goes behind everyone else's first job. A job that makes several
+calls at once (a large packet reviewed part by part) holds one slot per
+concurrent call.
+"""
+import itertools
+import threading
+import time
+from contextlib import contextmanager
+
+
+class _Ticket:
+    def __init__(self, session_id, seq, round_number, slots):
+        self.session_id = session_id
+        self.seq = seq
+        self.round = round_number
+        self.slots = slots
+        self.admitted = False
+
+
+class AdmissionQueue:
+    """Bounded, fair job queue shared by every session in the process."""
+
+    def __init__(self, capacity, expected_seconds=20.0):
+        self.capacity = max(1, capacity)
+        self._avg_seconds = expected_seconds
+        self._waiting = []
+        self._running = 0
+        self._per_session = {}  # session_id -> tickets waiting or running
+        self._seq = itertools.count()
+        self._cond = threading.Condition()
+        self.admitted_total = 0
+        self.longest_wait = 0.0
+
+    # --- BOOKKEEPING (caller holds self._cond) ---
+    def _order(self):
+        return sorted(self._waiting, key=lambda t: (t.round, t.seq))
+
+    def _admit_ready(self):
+        ordered = self._order()
+        # Strictly in order: a wide job at the head waits for room rather than being overtaken.
+        while ordered and self._running + ordered[0].slots <= self.capacity:
+            ticket = ordered.pop(0)
+            self._waiting.remove(ticket)
+            ticket.admitted = True
+            self._running += ticket.slots
+            self.admitted_total += 1
+        self._cond.notify_all()
+
+    def _eta(self, position):
+        # Jobs ahead of us finish ``capacity`` at a time.
+        return (position // self.capacity + 1) * self._avg_seconds
+
+    def _leave(self, ticket):
+        self._per_session[ticket.session_id] -= 1
+        if not self._per_session[ticket.session_id]:
+            del self._per_session[ticket.session_id]
+
+    # --- PUBLIC API ---
+    @contextmanager
+    def admit(self, session_id, on_wait=None, poll=1.0, slots=1):
+        """Hold ``slots`` slots (at most ``capacity``) for the duration of the ``with`` block.
+
+        While queued, ``on_wait(position, eta_seconds)`` is called about every
+        ``poll`` seconds from the waiting thread (position 1 is next in line).
+        If it raises (e.g. Streamlit stopping the script on a rerun), the
+        ticket is withdrawn.
+        """
+        with self._cond:
+            round_number = self._per_session.get(session_id, 0)
+            ticket = _Ticket(session_id, next(self._seq), round_number, min(max(1, slots), self.capacity))
+            self._per_session[session_id] = round_number + 1
+            self._waiting.append(ticket)
+            self._admit_ready()
+
+        queued_at = time.time()
+        try:
+            while True:
+                with self._cond:
+                    if ticket.admitted:
+                        break
+                    position = self._order().index(ticket) + 1
+                    eta = self._eta(position - 1)
+                if on_wait:
+                    on_wait(position, eta)
+                with self._cond:
+                    if not ticket.admitted:
+                        self._cond.wait(poll)
+        except BaseException:
+            with self._cond:
+                if ticket.admitted:
+                    self._running -= ticket.slots
+                else:
+                    self._waiting.remove(ticket)
+                self._leave(ticket)
+                self._admit_ready()
+            raise
+
+        started = time.time()
+        with self._cond:
+            self.longest_wait = max(self.longest_wait, started - queued_at)
+        try:
+            yield started - queued_at
+        finally:
+            with self._cond:
+                self._running -= ticket.slots
+                self._leave(ticket)
+                self._avg_seconds = 0.8 * self._avg_seconds + 0.2 * (time.time() - started)
+                self._admit_ready()
+
+    def snapshot(self):
+        with self._cond:
+            return {
+                "capacity": self.capacity,
+                "running": self._running,
+                "waiting": len(self._waiting),
+                "avg_seconds": self._avg_seconds,
+                "admitted": self.admitted_total,
+                "longest_wait": self.longest_wait,
+            }
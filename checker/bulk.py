@@ -0,0 +1,329 @@
+"""Headless bulk screening of a folder of PDFs.
+
+    python -m checker.bulk submissions/ --mode student --output results.jsonl --csv results.csv
+    python -m checker.bulk submissions/ --structured --csv results.csv   # JSON findings per file
+
+Every PDF is reviewed on its own, exactly as if it had been uploaded to the
+portal, by a bounded pool of worker threads that take keys from the same
+kind of KeyScheduler, review queue and memory budget the portal uses. Each
+result is appended to the JSONL file as soon as it is ready, so an
+interrupted run picks up where it stopped: files already reviewed
+successfully (same path, content, mode and --structured setting) are
+skipped.
+Files longer than the per-file character limit are marked ``truncated``.
+With ``--structured`` each record also carries the parsed JSON review
+(checker/structured.py), so a class's findings can be tallied directly.
+
+Keys come from ``BCS_DISTRICT_KEYS`` (comma-separated) or ``GOOGLE_API_KEY``,
+falling back to DISTRICT_KEYS / GOOGLE_API_KEY in .streamlit/secrets.toml.
+"""
+import argparse
+import csv
+import json
+import os
+import re
+import sys
+import threading
+import time
+import tomllib
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import datetime, timezone
+
+from checker import config
+from checker.budgeting import TokenEstimator
+from checker.clients import ClientPool
+from checker.extraction import extract_documents
+from checker.health import ModelHealth
+from checker.memory import MemoryLimitExceeded, estimate_request_bytes
+from checker.review import FILE_CHAR_LIMIT, review_documents
+from checker.rules import EXTERNAL, PROHIBITED, STUDENT, RuleEngine
+from checker.uploads import PdfSource
+
+# File names follow the portal's naming standards ("Smith, John - Survey -
+# Interview Questions"); the first pattern that matches picks the doc_type.
+DOC_TYPE_PATTERNS = {
+    STUDENT: [
+        (re.compile(r"survey|interview|questionnaire|questions", re.IGNORECASE), "SURVEY"),
+        (re.compile(r"principal|district", re.IGNORECASE), "PERMISSION_FORM"),
+        (re.compile(r"consent|assent|parent", re.IGNORECASE), "CONSENT_FORMS"),
+    ],
+    EXTERNAL: [
+        (re.compile(r"instrument|survey|interview|protocol|consent|assent|questionnaire", re.IGNORECASE), "INSTRUMENTS"),
+    ],
+}
+DEFAULT_DOC_TYPE = {STUDENT: "PROPOSAL", EXTERNAL: "FULL_PROPOSAL"}
+
+CSV_FIELDS = [
+    "file", "mode", "structured", "doc_type", "ok", "status", "source", "model", "truncated", "prohibited_flags",
+    "missing", "subjects", "action_steps", "error", "extract_seconds", "review_seconds", "total_seconds", "finished_at",
+]
+
+
+def guess_doc_type(file_name, mode):
+    for pattern, doc_type in DOC_TYPE_PATTERNS[mode]:
+        if pattern.search(file_name):
+            return doc_type
+    return DEFAULT_DOC_TYPE[mode]
+
+
+def find_pdfs(folder, recursive=False):
+    if recursive:
+        paths = [
+            os.path.join(root, name)
+            for root, _, names in os.walk(folder)
+            for name in names
+        ]
+    else:
+        paths = [os.path.join(folder, name) for name in os.listdir(folder)]
+    return sorted(p for p in paths if p.lower().endswith(".pdf") and os.path.isfile(p))
+
+
+def load_keys(secrets_path):
+    """District keys (or the single key) from the environment or secrets.toml."""
+    if os.environ.get("BCS_DISTRICT_KEYS"):
+        return [k.strip() for k in os.environ["BCS_DISTRICT_KEYS"].split(",") if k.strip()]
+    if os.environ.get("GOOGLE_API_KEY"):
+        return [os.environ["GOOGLE_API_KEY"]]
+    if secrets_path and os.path.exists(secrets_path):
+        with open(secrets_path, "rb") as f:
+            secrets = tomllib.load(f)
+        if secrets.get("DISTRICT_KEYS"):
+            return list(secrets["DISTRICT_KEYS"])
+        if secrets.get("GOOGLE_API_KEY"):
+            return [secrets["GOOGLE_API_KEY"]]
+    return []
+
+
+def _resume_key(record):
+    # Records written before "structured" was recorded were plain-text reviews.
+    return record["file"], record.get("sha256"), record.get("mode"), bool(record.get("structured"))
+
+
+def load_done(output_path):
+    """``{(file, sha256, mode, structured)}`` of successful reviews already in the output file."""
+    done = set()
+    if not os.path.exists(output_path):
+        return done
+    with open(output_path, encoding="utf-8") as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                continue  # A line cut short by an interrupted run.
+            if record.get("ok"):
+                done.add(_resume_key(record))
+    return done
+
+
+class ResultWriter:
+    """Appends one JSON line per result and flushes it straight away."""
+
+    def __init__(self, path):
+        self._file = open(path, "a", encoding="utf-8")
+        self._lock = threading.Lock()
+
+    def write(self, record):
+        line = json.dumps(record, ensure_ascii=False)
+        with self._lock:
+            self._file.write(line + "\n")
+            self._file.flush()
+
+    def close(self):
+        self._file.close()
+
+
+def write_csv(output_path, csv_path):
+    """Summarise the JSONL results (latest record per file, mode and setting) as CSV."""
+    latest = {}
+    with open(output_path, encoding="utf-8") as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                continue
+            file, _, mode, structured = _resume_key(record)
+            latest[file, mode, structured] = record
+    with open(csv_path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.DictWriter(f, fieldnames=CSV_FIELDS, extrasaction="ignore")
+        writer.writeheader()
+        for record in latest.values():
+            review = record.get("review") or {}
+            writer.writerow(dict(
+                record,
+                missing="; ".join(record.get("missing", [])),
+                subjects=review.get("subjects", ""),
+                action_steps=len(review["action_steps"]) if review else "",
+            ))
+
+
+class BulkScreener:
+    """Shared state for one run: caches, key pool, review queue, memory budget, model health and rules."""
+
+    def __init__(self, mode, keys, force_fresh=False, structured=False):
+        self.mode = mode
+        self.force_fresh = force_fresh
+        self.structured = structured
+        self.key_scheduler = config.key_scheduler(keys)
+        # Same limits as the portal: a large packet's parts hold queue slots,
+        # and each file reserves its working set before it is parsed.
+        self.admission = config.admission_queue(len(keys))
+        self.memory = config.memory_budget()
+        self.health = ModelHealth()
+        self.clients = ClientPool()
+        self.estimator = TokenEstimator()
+        self.rule_engine = RuleEngine()
+        # Same settings (and disk directories) as the portal, so the two share results.
+        self.text_cache = config.text_cache()
+        self.response_cache = config.response_cache()
+
+    def screen(self, path, sha256):
+        """Review one PDF; returns the JSONL record."""
+        started = time.perf_counter()
+        # Parsed through a memory map of the file itself, so the bytes never sit on the heap.
+        source = PdfSource(os.path.basename(path), path, os.path.getsize(path), sha256)
+        name = source.name
+        doc_type = guess_doc_type(name, self.mode)
+        record = {
+            "file": path, "sha256": sha256, "mode": self.mode, "structured": self.structured, "doc_type": doc_type,
+            "ok": False, "status": None, "source": None, "model": "", "error": None,
+            "prohibited_flags": 0, "missing": [], "attempts": [], "text": None, "review": None, "truncated": False,
+        }
+
+        try:
+            with self.memory.reserve(path, estimate_request_bytes([source.size], FILE_CHAR_LIMIT)):
+                self._review(record, name, source, doc_type, started)
+        except MemoryLimitExceeded as e:
+            record["error"] = str(e)
+
+        record["total_seconds"] = round(time.perf_counter() - started, 3)
+        record["finished_at"] = datetime.now(timezone.utc).isoformat(timespec="seconds")
+        return record
+
+    def _review(self, record, name, source, doc_type, started):
+        def on_file(name, pages, chars, seconds, cached, complete):
+            # Reviewed only up to FILE_CHAR_LIMIT; worth splitting and screening again.
+            record["truncated"] = not complete
+
+        text = extract_documents([(name, source)], self.text_cache, char_budget=FILE_CHAR_LIMIT, on_file=on_file)[0]
+        record["extract_seconds"] = round(time.perf_counter() - started, 3)
+        if text.startswith("Error reading PDF"):
+            record["error"] = text
+            return
+        result = review_documents(
+            {doc_type: [(name, text)]},
+            self.mode,
+            self.estimator,
+            self.rule_engine,
+            self.clients,
+            key_scheduler=self.key_scheduler,
+            health=self.health,
+            response_cache=self.response_cache,
+            force_fresh=self.force_fresh,
+            structured=self.structured,
+            admission=self.admission,
+            session_id=record["file"],
+        )
+        prescreen = result["prescreen"]
+        record.update(
+            ok=result["ok"],
+            status=result["status"],
+            source=result["source"],
+            model=result["model"],
+            text=result["text"],
+            review=result["review"],
+            prohibited_flags=sum(f["kind"] == PROHIBITED for f in prescreen["findings"]),
+            missing=[rule["label"] for rule in prescreen["missing"]],
+            attempts=[f"{model} ({kind})" for model, kind, _ in result["attempts"]],
+            review_seconds=round(result["seconds"], 3),
+        )
+        if not result["ok"]:
+            record["error"] = "All models failed"
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m checker.bulk", description="Screen a folder of PDFs.")
+    parser.add_argument("folder", help="Folder of PDF files to screen.")
+    parser.add_argument("--mode", choices=[STUDENT, EXTERNAL], default=STUDENT,
+                        help="Review criteria: AP Research student or external researcher.")
+    parser.add_argument("--output", default="screening_results.jsonl",
+                        help="JSONL results file; appended to, and used to resume.")
+    parser.add_argument("--csv", help="Also write a CSV summary here when the run ends.")
+    parser.add_argument("--workers", type=int, default=4,
+                        help="Files reviewed at once (capped at the number of keys).")
+    parser.add_argument("--recursive", action="store_true", help="Include PDFs in subfolders.")
+    parser.add_argument("--force-fresh", action="store_true",
+                        help="Ignore saved results and the instant pre-screen; re-review everything.")
+    parser.add_argument("--structured", action="store_true",
+                        help="Ask for JSON reviews (status, subjects, action steps) and keep them in each record.")
+    parser.add_argument("--secrets", default=os.path.join(".streamlit", "secrets.toml"),
+                        help="Streamlit secrets file to read keys from.")
+    args = parser.parse_args(argv)
+
+    keys = load_keys(args.secrets)
+    if not keys:
+        parser.error("no API key found; set BCS_DISTRICT_KEYS or GOOGLE_API_KEY, or pass --secrets")
+
+    done = set() if args.force_fresh else load_done(args.output)
+    todo = []
+    skipped = 0
+    for path in find_pdfs(args.folder, args.recursive):
+        sha256 = PdfSource.from_path(path).sha256
+        if (path, sha256, args.mode, args.structured) in done:
+            skipped += 1
+        else:
+            todo.append((path, sha256))
+    print(f"{len(todo)} file(s) to screen, {skipped} already done.", file=sys.stderr)
+
+    screener = BulkScreener(args.mode, keys, force_fresh=args.force_fresh, structured=args.structured)
+    # A worker holds one key per request, so more workers than keys only queue.
+    workers = max(1, min(args.workers, len(keys), len(todo) or 1))
+    writer = ResultWriter(args.output)
+    failures = 0
+    executor = ThreadPoolExecutor(max_workers=workers)
+    futures = {}
+    written = set()
+
+    def result_record(future):
+        try:
+            return future.result()
+        except Exception as e:
+            return {
+                "file": futures[future], "mode": args.mode, "structured": args.structured,
+                "ok": False, "error": f"{type(e).__name__}: {e}",
+            }
+
+    try:
+        futures = {executor.submit(screener.screen, path, sha256): path for path, sha256 in todo}
+        for finished, future in enumerate(as_completed(futures), start=1):
+            record = result_record(future)
+            writer.write(record)
+            written.add(future)
+            if not record["ok"]:
+                failures += 1
+            outcome = record.get("status") or record.get("error") or "no status line"
+            print(
+                f"[{finished}/{len(todo)}] {os.path.basename(futures[future])}: {outcome}"
+                f" ({record.get('model') or '—'}, {record.get('total_seconds', 0):.1f}s)",
+                file=sys.stderr,
+            )
+    except KeyboardInterrupt:
+        print("Interrupted; finishing the reviews in progress (their results are kept)...", file=sys.stderr)
+        executor.shutdown(wait=True, cancel_futures=True)
+        # Reviews already paid for are saved, so the resumed run skips them.
+        for future in futures:
+            if future not in written and future.done() and not future.cancelled():
+                writer.write(result_record(future))
+        print("Run the same command again to resume.", file=sys.stderr)
+        return 130
+    finally:
+        executor.shutdown(wait=True, cancel_futures=True)
+        writer.close()
+
+    if args.csv:
+        write_csv(args.output, args.csv)
+    print(f"Done: {len(todo) - failures} reviewed, {failures} failed. Results in {args.output}", file=sys.stderr)
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,186 @@
+"""Content-addressed LRU cache with an optional on-disk tier.
+
+One instance is created per server process (see ``st.cache_resource`` in
+app.py), so every student session shares the same entries.
+"""
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+
+
+def content_key(data):
+    """SHA-256 hex digest of raw bytes (or a str, encoded as UTF-8)."""
+    if isinstance(data, str):
+        data = data.encode("utf-8")
+    return hashlib.sha256(data).hexdigest()
+
+
+def _normalize(text):
+    return " ".join(str(text).split())
+
+
+def response_key(system_prompt, documents, model_name, generation_config, safety_settings):
+    """Cache key for one model call.
+
+    Document text is whitespace-normalised so re-exported PDFs that only
+    differ in line breaks still hit the same entry.
+    """
+    payload = {
+        "system_prompt": _normalize(system_prompt),
+        "documents": {doc_type: _normalize(text) for doc_type, text in sorted(documents.items())},
+        "model": model_name,
+        "generation_config": generation_config,
+        "safety_settings": safety_settings,
+    }
+    return content_key(json.dumps(payload, sort_keys=True))
+
+
+def _sizeof(value):
+    if isinstance(value, str):
+        return len(value)
+    return len(json.dumps(value))
+
+
+class ContentCache:
+    """Thread-safe LRU cache bounded by entry count and total size.
+
+    Values must be JSON-serialisable. When ``disk_dir`` is set, every entry is
+    also written there as ``<key>.json`` so it survives a container restart;
+    the disk tier is pruned oldest-first once it grows past ``max_disk_bytes``.
+    Entries older than ``ttl`` seconds (if given) are treated as misses.
+    """
+
+    def __init__(self, max_entries=256, max_bytes=64 * 1024 * 1024,
+                 disk_dir=None, max_disk_bytes=512 * 1024 * 1024, ttl=None):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.disk_dir = disk_dir
+        self.max_disk_bytes = max_disk_bytes
+        self.ttl = ttl
+
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+        if self.disk_dir:
+            os.makedirs(self.disk_dir, exist_ok=True)
+
+    # --- PUBLIC API ---
+    def get(self, key):
+        with self._lock:
+            if key in self._entries:
+                value, stored_at = self._entries[key]
+                if not self._expired(stored_at):
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return value
+                self._bytes -= _sizeof(self._entries.pop(key)[0])
+
+        entry = self._read_disk(key)
+        with self._lock:
+            if entry is None:
+                self.misses += 1
+                return None
+            self.disk_hits += 1
+            value, stored_at = entry
+            self._store(key, value, stored_at)
+        return value
+
+    def put(self, key, value):
+        stored_at = time.time()
+        with self._lock:
+            self._store(key, value, stored_at)
+        self._write_disk(key, value, stored_at)
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.disk_hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "hits": self.hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": (self.hits + self.disk_hits) / lookups if lookups else 0.0,
+            }
+
+    # --- MEMORY TIER ---
+    def _expired(self, stored_at):
+        return self.ttl is not None and time.time() - stored_at > self.ttl
+
+    def _store(self, key, value, stored_at):
+        # Caller holds self._lock.
+        size = _sizeof(value)
+        if size > self.max_bytes:
+            return
+        if key in self._entries:
+            self._bytes -= _sizeof(self._entries.pop(key)[0])
+        self._entries[key] = (value, stored_at)
+        self._bytes += size
+        while self._entries and (len(self._entries) > self.max_entries or self._bytes > self.max_bytes):
+            _, (evicted, _) = self._entries.popitem(last=False)
+            self._bytes -= _sizeof(evicted)
+            self.evictions += 1
+
+    # --- DISK TIER ---
+    def _path(self, key):
+        return os.path.join(self.disk_dir, f"{key}.json")
+
+    def _read_disk(self, key):
+        if not self.disk_dir:
+            return None
+        path = self._path(key)
+        try:
+            with open(path, "r", encoding="utf-8") as fh:
+                entry = json.load(fh)
+            value, stored_at = entry["value"], entry["stored_at"]
+            if self._expired(stored_at):
+                os.remove(path)
+                return None
+            os.utime(path)  # Keeps disk pruning least-recently-used.
+            return value, stored_at
+        except (OSError, ValueError, TypeError, KeyError):
+            return None
+
+    def _write_disk(self, key, value, stored_at):
+        if not self.disk_dir:
+            return
+        path = self._path(key)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            with open(tmp_path, "w", encoding="utf-8") as fh:
+                json.dump({"stored_at": stored_at, "value": value}, fh)
+            os.replace(tmp_path, path)
+            self._prune_disk()
+        except OSError:
+            # The disk tier is best-effort; the memory tier still has the entry.
+            try:
+                os.remove(tmp_path)
+            except OSError:
+                pass
+
+    def _prune_disk(self):
+        files = []
+        total = 0
+        for entry in os.scandir(self.disk_dir):
+            if entry.name.endswith(".json"):
+                st = entry.stat()
+                files.append((st.st_mtime, st.st_size, entry.path))
+                total += st.st_size
+        files.sort()
+        while files and total > self.max_disk_bytes:
+            _, size, path = files.pop(0)
+            try:
+                os.remove(path)
+                total -= size
+            except OSError:
+                pass
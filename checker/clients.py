@@ -0,0 +1,100 @@
+"""Configured Gemini clients and model handles, one set per API key.
+
+``genai.configure`` swaps process-wide state, so two sessions on different
+keys could each end up sending with the other's key, and every attempt paid
+for a fresh client. ``ClientPool`` builds each key's clients once, through
+the SDK's own client manager, and hands out ``GenerativeModel`` handles
+bound to them. Sync clients are shared by every thread; async (gRPC)
+clients belong to one event loop, so they are kept per loop and dropped
+when the loop closes.
+
+Students may paste personal keys, so the pool keeps at most ``max_keys``
+keys and forgets the least recently used one (with its models) beyond that.
+"""
+import asyncio
+import json
+import threading
+from collections import OrderedDict
+
+
+def _freeze(value):
+    return json.dumps(value, sort_keys=True, default=str)
+
+
+class ClientPool:
+    """Per-key Gemini clients, shared by every session in the process.
+
+    ``client_config`` is passed to each key's client manager alongside the
+    key (e.g. ``transport="rest"`` and ``client_options`` to point at a
+    local stand-in for the API). ``max_keys`` should cover the district
+    key pool with room to spare.
+    """
+
+    def __init__(self, max_keys=64, **client_config):
+        self.max_keys = max_keys
+        self.client_config = client_config
+        self._managers = OrderedDict()   # key -> client manager, least recently used first
+        self._models = {}
+        self._async_models = {}   # (loop, key, ...) -> model; pruned when loops close
+        self._lock = threading.Lock()
+
+    def _manager(self, key):
+        # Caller holds self._lock.
+        if key in self._managers:
+            self._managers.move_to_end(key)
+            return self._managers[key]
+        from google.generativeai import client as genai_client  # Deferred: the SDK is slow to import.
+        manager = genai_client._ClientManager()
+        manager.configure(api_key=key, **self.client_config)
+        self._managers[key] = manager
+        while len(self._managers) > self.max_keys:
+            self._forget(next(iter(self._managers)))
+        return manager
+
+    def _forget(self, key):
+        # Caller holds self._lock.
+        del self._managers[key]
+        for cache_key in [k for k in self._models if k[0] == key]:
+            del self._models[cache_key]
+        for cache_key in [k for k in self._async_models if k[1] == key]:
+            del self._async_models[cache_key]
+
+    def _new_model(self, model_name, generation_config, safety_settings):
+        import google.generativeai as genai
+        return genai.GenerativeModel(
+            model_name=model_name,
+            generation_config=generation_config,
+            safety_settings=safety_settings
+        )
+
+    def model(self, key, model_name, generation_config, safety_settings):
+        """A ``GenerativeModel`` that always sends with ``key``."""
+        cache_key = (key, model_name, _freeze(generation_config), _freeze(safety_settings))
+        with self._lock:
+            manager = self._manager(key)
+            model = self._models.get(cache_key)
+            if model is None:
+                model = self._new_model(model_name, generation_config, safety_settings)
+                model._client = manager.get_default_client("generative")
+                self._models[cache_key] = model
+        return model
+
+    def async_model(self, key, model_name, generation_config, safety_settings):
+        """Like ``model`` for ``generate_content_async``; call from inside the running loop."""
+        loop = asyncio.get_running_loop()
+        cache_key = (loop, key, model_name, _freeze(generation_config), _freeze(safety_settings))
+        with self._lock:
+            for stale in [k for k in self._async_models if k[0].is_closed()]:
+                del self._async_models[stale]
+            manager = self._manager(key)
+            model = self._async_models.get(cache_key)
+            if model is None:
+                model = self._new_model(model_name, generation_config, safety_settings)
+                # make_client (not get_default_client) so each loop gets its own channel.
+                model._async_client = manager.make_client("generative_async")
+                self._async_models[cache_key] = model
+        return model
+
+    def __len__(self):
+        with self._lock:
+            return len(self._managers)
@@ -0,0 +1,57 @@
+"""Shared objects configured from ``BCS_*`` environment variables.
+
+The portal (app.py) and the bulk CLI (checker.bulk) both build their key
+pool, review queue, memory budget and caches here, so they apply the same
+limits and, with the disk directories set, share extracted text and
+finished reviews.
+"""
+import os
+
+from checker.admission import AdmissionQueue
+from checker.caching import ContentCache
+from checker.keys import KeyScheduler
+from checker.memory import MemoryBudget
+
+
+def key_scheduler(keys):
+    # Free-tier Flash-Lite limits per key; override for paid keys.
+    return KeyScheduler(
+        keys,
+        rpm=int(os.environ.get("BCS_KEY_RPM", 15)),
+        rpd=int(os.environ.get("BCS_KEY_RPD", 1000)),
+    )
+
+
+def admission_queue(key_count):
+    # One running model call per key by default; BCS_QUEUE_CAPACITY overrides.
+    return AdmissionQueue(int(os.environ.get("BCS_QUEUE_CAPACITY", key_count)))
+
+
+def memory_budget():
+    # Estimated working sets of running reviews, capped per session (or per
+    # bulk file) and for the whole process, so a few huge packets can't
+    # exhaust the container.
+    return MemoryBudget(
+        total_bytes=int(os.environ.get("BCS_MEMORY_MB", 1024)) * 1024 * 1024,
+        session_bytes=int(os.environ.get("BCS_SESSION_MEMORY_MB", 256)) * 1024 * 1024,
+        wait=float(os.environ.get("BCS_MEMORY_WAIT_SECONDS", 30)),
+    )
+
+
+def text_cache():
+    # Set BCS_TEXT_CACHE_DIR to keep extracted text across container restarts.
+    return ContentCache(
+        max_entries=int(os.environ.get("BCS_TEXT_CACHE_ENTRIES", 256)),
+        max_bytes=int(os.environ.get("BCS_TEXT_CACHE_MB", 64)) * 1024 * 1024,
+        disk_dir=os.environ.get("BCS_TEXT_CACHE_DIR") or None,
+    )
+
+
+def response_cache():
+    # Finished reviews, so pressing "Run Compliance Check" twice costs one Gemini call.
+    return ContentCache(
+        max_entries=int(os.environ.get("BCS_RESPONSE_CACHE_ENTRIES", 512)),
+        max_bytes=int(os.environ.get("BCS_RESPONSE_CACHE_MB", 16)) * 1024 * 1024,
+        disk_dir=os.environ.get("BCS_RESPONSE_CACHE_DIR") or None,
+        ttl=float(os.environ.get("BCS_RESPONSE_CACHE_TTL_HOURS", 24)) * 3600,
+    )
@@ -0,0 +1,51 @@
+"""Classify Gemini API failures so callers can react to each kind differently.
+
+Matching is done on exception class names and messages so this module does
+not need to import google.api_core.
+"""
+import random
+
+QUOTA = "quota"              # 429 / ResourceExhausted: this key is rate-limited or out of daily quota
+TRANSIENT = "transient"      # 500/503/504, timeouts, dropped connections: worth retrying shortly
+INVALID_KEY = "invalid_key"  # 400/401/403 about the API key itself
+SAFETY = "safety"            # Prompt or response blocked by safety filters
+UNKNOWN = "unknown"
+
+_TRANSIENT_NAMES = (
+    "serviceunavailable", "internalservererror", "deadlineexceeded", "gatewaytimeout",
+    "timeout", "connectionerror", "aborted", "unavailable",
+)
+_TRANSIENT_TEXT = ("500", "502", "503", "504", "timed out", "temporarily", "overloaded", "try again")
+
+
+def _describe(error):
+    return f"{type(error).__name__} {error}".lower()
+
+
+def is_quota_error(error):
+    """True for 429 / ResourceExhausted responses from the Gemini API."""
+    text = _describe(error)
+    return "429" in text or "resourceexhausted" in text or "quota" in text or "rate limit" in text
+
+
+def is_daily_quota_error(error):
+    text = str(error).lower()
+    return is_quota_error(error) and ("per day" in text or "perday" in text or "daily" in text)
+
+
+def classify_error(error):
+    text = _describe(error)
+    if is_quota_error(error):
+        return QUOTA
+    if "api key" in text or "api_key" in text or "unauthenticated" in text or "permissiondenied" in text:
+        return INVALID_KEY
+    if "blockedprompt" in text or "stopcandidate" in text or "safety" in text or "finish_reason" in text:
+        return SAFETY
+    if any(name in text for name in _TRANSIENT_NAMES) or any(code in text for code in _TRANSIENT_TEXT):
+        return TRANSIENT
+    return UNKNOWN
+
+
+def backoff_delay(attempt, base=1.0, cap=8.0):
+    """Exponential backoff with full jitter, so retrying sessions spread out."""
+    return random.uniform(0, min(cap, base * 2 ** attempt))
@@ -0,0 +1,228 @@
+"""PDF text extraction: page-at-a-time, budget-aware and optionally parallel.
+
+A PDF is either raw bytes or a ``PdfSource`` (a file on disk, read through
+a memory map; see checker/uploads.py).
+"""
+import io
+import multiprocessing
+import os
+import queue
+import sys
+import time
+import types
+from contextlib import contextmanager, nullcontext
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+
+from checker.budgeting import PAGE_BREAK
+from checker.caching import content_key
+from checker.uploads import PdfSource
+
+
+def _open(data):
+    return data.open() if isinstance(data, PdfSource) else nullcontext(io.BytesIO(data))
+
+
+def _key(data):
+    return data.sha256 if isinstance(data, PdfSource) else content_key(data)
+
+
+def iter_pdf_pages(data):
+    """Yield ``(page_number, page_count, text)`` one page at a time."""
+    from PyPDF2 import PdfReader  # Deferred until the first PDF is actually read.
+    with _open(data) as stream:
+        reader = PdfReader(stream)
+        total = len(reader.pages)
+        for number, page in enumerate(reader.pages, start=1):
+            yield number, total, page.extract_text() or ""
+
+
+def extract_pdf_text(data, char_budget=None, on_page=None):
+    """Extract text until ``char_budget`` characters have been collected.
+
+    Returns ``(text, complete)`` where ``complete`` is False when pages were
+    left unread because the budget was already filled. Pages are separated
+    by ``PAGE_BREAK`` so later stages can still tell them apart.
+    """
+    parts = []
+    collected = 0
+    complete = True
+    for number, total, page_text in iter_pdf_pages(data):
+        parts.append(page_text)
+        collected += len(page_text)
+        if on_page:
+            on_page(number, total)
+        if char_budget is not None and collected >= char_budget:
+            complete = number == total
+            break
+    return PAGE_BREAK.join(parts), complete
+
+
+def _timed_extract(data, char_budget, on_page):
+    started = time.perf_counter()
+    text, complete = extract_pdf_text(data, char_budget, on_page)
+    return text, complete, time.perf_counter() - started
+
+
+def _extract_in_worker(index, data, char_budget, progress):
+    # Runs in a pool process, so progress goes back through a manager queue.
+    def report(number, total):
+        if progress is not None:
+            progress.put((index, number, total))
+    return _timed_extract(data, char_budget, report)
+
+
+@contextmanager
+def _main_hidden():
+    """Hide ``__main__`` from worker processes started inside the block.
+
+    Streamlit registers app.py as ``__main__``, and spawn/forkserver children
+    re-run the parent's ``__main__`` file before unpickling their work, which
+    for app.py is the whole app. The workers only need this module.
+    """
+    main = sys.modules.get("__main__")
+    stub = types.ModuleType("__main__")
+    sys.modules["__main__"] = stub
+    try:
+        yield
+    finally:
+        # Another script run may have installed its own __main__ meanwhile.
+        if sys.modules.get("__main__") is stub:
+            sys.modules["__main__"] = main
+
+
+class ExtractionPool:
+    """Process pool for parsing several PDFs at once.
+
+    PyPDF2 is pure Python, so threads would just queue up on the GIL.
+    Streamlit's server is multi-threaded, so it is never forked: workers come
+    from a forkserver (a clean process started once) where the OS has one,
+    and are spawned otherwise.
+    """
+
+    def __init__(self, max_workers=None):
+        self.max_workers = max_workers or min(4, os.cpu_count() or 1)
+        if "forkserver" in multiprocessing.get_all_start_methods():
+            self._context = multiprocessing.get_context("forkserver")
+            # The server preloads this module instead of __main__ (app.py).
+            self._context.set_forkserver_preload([__name__])
+        else:
+            self._context = multiprocessing.get_context("spawn")
+        self._executor = ProcessPoolExecutor(max_workers=self.max_workers, mp_context=self._context)
+        self._manager = None
+
+    def _reset(self):
+        # A crashed worker breaks the executor for good; start a fresh one.
+        self._executor.shutdown(wait=False, cancel_futures=True)
+        self._executor = ProcessPoolExecutor(max_workers=self.max_workers, mp_context=self._context)
+
+    def _progress_queue(self):
+        if self._manager is None:
+            with _main_hidden():
+                self._manager = self._context.Manager()
+        return self._manager.Queue()
+
+    def map(self, blobs, char_budget=None, on_page=None):
+        """Extract every blob; returns ``(text, complete, seconds)`` or the raised exception per blob.
+
+        Send PdfSources rather than bytes where possible: workers then get a
+        path to map instead of a pickled copy of the file.
+
+        ``on_page(index, page_number, page_count)`` is called from the calling
+        thread, so it is safe to update Streamlit elements from it.
+        """
+        progress = self._progress_queue() if on_page else None
+        try:
+            # Workers are started on demand by submit().
+            with _main_hidden():
+                futures = [
+                    self._executor.submit(_extract_in_worker, index, data, char_budget, progress)
+                    for index, data in enumerate(blobs)
+                ]
+        except BrokenProcessPool:
+            self._reset()
+            raise
+        pending = set(futures)
+        while pending:
+            _, pending = wait(pending, timeout=0.1, return_when=FIRST_COMPLETED)
+            _drain(progress, on_page)
+        _drain(progress, on_page)
+
+        results = []
+        for future in futures:
+            try:
+                results.append(future.result())
+            except BrokenProcessPool:
+                self._reset()
+                raise
+            except Exception as e:
+                results.append(e)
+        return results
+
+
+def _drain(progress, on_page):
+    if progress is None:
+        return
+    while True:
+        try:
+            index, number, total = progress.get_nowait()
+        except queue.Empty:
+            return
+        on_page(index, number, total)
+
+
+def extract_documents(files, cache, pool=None, char_budget=None, on_page=None, on_file=None):
+    """Extract text for a list of ``(name, data)`` uploads, in order; ``data`` is bytes or a PdfSource.
+
+    Cached text is reused when it is complete or already covers the budget.
+    Files that still need parsing go through ``pool`` when there is more than
+    one of them. Unreadable files come back as an "Error reading PDF" string,
+    as the portal has always shown them, and are not cached.
+    ``on_page(name, page_number, page_count)`` reports progress and
+    ``on_file(name, pages_read, chars, seconds, cached, complete)`` is called
+    once per readable file; ``complete`` is False when ``char_budget`` ended
+    extraction before the last page.
+    """
+    texts = [None] * len(files)
+    todo = []
+    for index, (name, data) in enumerate(files):
+        key = _key(data)
+        cached = cache.get(key)
+        if cached and (cached["complete"] or (char_budget is not None and len(cached["text"]) >= char_budget)):
+            texts[index] = cached["text"]
+            if on_file:
+                on_file(name, cached["text"].count(PAGE_BREAK) + 1, len(cached["text"]), 0.0, True, cached["complete"])
+        else:
+            todo.append((index, name, data, key))
+
+    results = None
+    if pool is not None and len(todo) > 1:
+        pool_report = (lambda position, number, total: on_page(todo[position][1], number, total)) if on_page else None
+        try:
+            results = pool.map([data for _, _, data, _ in todo], char_budget, pool_report)
+        except Exception:
+            # The pool is only a speed-up (a worker may have crashed, or the
+            # host can't start processes); parse serially instead.
+            results = None
+
+    if results is None:
+        results = []
+        for _, name, data, _ in todo:
+            def report(number, total, name=name):
+                if on_page:
+                    on_page(name, number, total)
+            try:
+                results.append(_timed_extract(data, char_budget, report))
+            except Exception as e:
+                results.append(e)
+
+    for (index, name, _, key), result in zip(todo, results):
+        if isinstance(result, Exception):
+            texts[index] = f"Error reading PDF: {result}"
+            continue
+        text, complete, seconds = result
+        cache.put(key, {"text": text, "complete": complete})
+        texts[index] = text
+        if on_file:
+            on_file(name, text.count(PAGE_BREAK) + 1, len(text), seconds, False, complete)
+    return texts
@@ -0,0 +1,212 @@
+"""Walk the target_models fallback chain across the key pool.
+
+``generate_with_fallback`` is used for the main review call. The async
+variant is used when several documents are reviewed concurrently; both share
+the same retry rules through ``_ModelAttempt``.
+"""
+import asyncio
+import time
+
+from checker.errors import INVALID_KEY, QUOTA, SAFETY, TRANSIENT, backoff_delay, classify_error
+
+
+class AllModelsFailed(Exception):
+    """Raised when no model in the chain produced a response.
+
+    ``attempts`` holds ``(model_name, error_kind, error)`` for every try, in order.
+    """
+
+    def __init__(self, attempts):
+        super().__init__("All models failed")
+        self.attempts = attempts
+
+
+class _ModelAttempt:
+    """Retry bookkeeping for one model within one request.
+
+    - Quota errors retry the same model on another key (up to ``key_retries``).
+    - Transient errors retry the same model after a jittered backoff.
+    - Invalid-key errors try another key; with a single key they end the walk.
+    - Safety blocks and anything else move on to the next model.
+
+    Only a model the key pool has no usable key left for counts as out of
+    quota in ``health``; a 429 on one key is the KeyScheduler's to handle.
+    """
+
+    RETRY, NEXT_MODEL = "retry", "next_model"
+
+    def __init__(self, model_name, attempts, key_scheduler, api_key, key_retries, transient_retries):
+        self.model_name = model_name
+        self.attempts = attempts
+        self.key_scheduler = key_scheduler
+        self.api_key = api_key
+        self.key_retries = key_retries
+        self.transient_retries = transient_retries
+        self.tried_keys = []
+        self.transient_tries = 0
+        self.last_kind = None
+        self.no_keys_left = False
+        self.held_key = None
+        self.recorded = False
+
+    def keys_left(self):
+        if self.key_scheduler is None:
+            return True
+        return len(self.tried_keys) < min(self.key_retries, len(self.key_scheduler))
+
+    def got_key(self, key):
+        """Record the key about to be used; False when the pool had none."""
+        if self.key_scheduler is None:
+            return True
+        if key is None:
+            self.attempts.append((self.model_name, QUOTA, None))
+            self.last_kind = QUOTA
+            self.no_keys_left = True
+            return False
+        self.tried_keys.append(key)
+        self.held_key = key
+        return True
+
+    def key(self):
+        return self.tried_keys[-1] if self.key_scheduler is not None else self.api_key
+
+    def succeeded(self):
+        if self.key_scheduler is not None:
+            self.key_scheduler.release(self.key(), model=self.model_name)
+            self.held_key = None
+
+    def failed(self, error):
+        """Returns ``(action, delay_seconds)``; raises AllModelsFailed to end the walk."""
+        kind = classify_error(error)
+        self.last_kind = kind
+        self.attempts.append((self.model_name, kind, error))
+        if self.key_scheduler is not None:
+            self.key_scheduler.release(self.key(), error=error, model=self.model_name)
+            self.held_key = None
+        if kind == TRANSIENT and self.transient_tries < self.transient_retries:
+            delay = backoff_delay(self.transient_tries)
+            self.transient_tries += 1
+            if self.key_scheduler is not None:
+                self.tried_keys.pop()  # Same key is fine; the server hiccuped.
+            return self.RETRY, delay
+        if kind in (QUOTA, INVALID_KEY) and self.key_scheduler is not None:
+            return self.RETRY, 0.0
+        if kind == INVALID_KEY:
+            # A bad personal key fails the same way on every model.
+            raise AllModelsFailed(self.attempts)
+        return self.NEXT_MODEL, 0.0
+
+    def record(self, health, ok):
+        """Report how this model did to ``health`` once its turn in the walk is over."""
+        self.recorded = True
+        if health is None:
+            return
+        if ok:
+            health.record_success(self.model_name)
+        elif self.last_kind == QUOTA and not self.no_keys_left:
+            return
+        elif self.last_kind not in (None, SAFETY):
+            health.record_failure(self.model_name, self.last_kind)
+
+    def close(self, health):
+        """Undo what an interrupted attempt still holds.
+
+        Streamlit's RerunException and StopException (and asyncio's
+        CancelledError) are BaseExceptions raised mid-call, e.g. from a
+        streaming callback. The key goes back to the pool, and a half-open
+        probe that never finished is handed to the next request.
+        """
+        if self.held_key is not None:
+            self.key_scheduler.release(self.held_key, model=self.model_name)
+            self.held_key = None
+        if not self.recorded and health is not None:
+            health.release_probe(self.model_name)
+
+
+def _plan(models, health):
+    """Yield models to try: healthy ones first, open circuits only if nothing else is left.
+
+    This is a generator so ``health.allow`` (which may hand out the single
+    half-open probe) is only asked about models the walk actually reaches.
+    """
+    ordered = health.order(models) if health else list(models)
+    skipped = []
+    for model_name in ordered:
+        if health is not None and not health.allow(model_name):
+            skipped.append(model_name)
+            continue
+        yield model_name
+    if len(skipped) == len(ordered):
+        yield from skipped
+
+
+def generate_with_fallback(models, call, key_scheduler=None, api_key=None, health=None,
+                           key_retries=3, key_wait=5.0, transient_retries=2, sleep=time.sleep):
+    """Return ``(model_name, result)`` from the first model that answers.
+
+    ``call(model_name, api_key)`` does the actual request. District keys come
+    from ``key_scheduler``; otherwise the single ``api_key`` is used. Models
+    whose circuit is open in ``health`` are skipped unless none are healthy.
+    """
+    attempts = []
+    for model_name in _plan(models, health):
+        attempt = _ModelAttempt(model_name, attempts, key_scheduler, api_key, key_retries, transient_retries)
+        try:
+            while attempt.keys_left():
+                key = None
+                if key_scheduler is not None:
+                    key = key_scheduler.acquire(model_name, timeout=key_wait, exclude=attempt.tried_keys)
+                if not attempt.got_key(key):
+                    break
+                try:
+                    result = call(model_name, attempt.key())
+                except Exception as e:
+                    action, delay = attempt.failed(e)
+                    if action == attempt.NEXT_MODEL:
+                        break
+                    if delay:
+                        sleep(delay)
+                    continue
+                attempt.succeeded()
+                attempt.record(health, True)
+                return model_name, result
+            attempt.record(health, False)
+        finally:
+            attempt.close(health)
+
+    raise AllModelsFailed(attempts)
+
+
+async def generate_with_fallback_async(models, call, key_scheduler=None, api_key=None, health=None,
+                                       key_retries=3, key_wait=5.0, transient_retries=2):
+    """Async twin of ``generate_with_fallback``; ``call`` must be a coroutine function."""
+    attempts = []
+    for model_name in _plan(models, health):
+        attempt = _ModelAttempt(model_name, attempts, key_scheduler, api_key, key_retries, transient_retries)
+        try:
+            while attempt.keys_left():
+                key = None
+                if key_scheduler is not None:
+                    # acquire() may wait for a bucket to refill; keep that off the event loop.
+                    key = await asyncio.to_thread(
+                        key_scheduler.acquire, model_name, key_wait, list(attempt.tried_keys)
+                    )
+                if not attempt.got_key(key):
+                    break
+                try:
+                    result = await call(model_name, attempt.key())
+                except Exception as e:
+                    action, delay = attempt.failed(e)
+                    if action == attempt.NEXT_MODEL:
+                        break
+                    if delay:
+                        await asyncio.sleep(delay)
+                    continue
+                attempt.succeeded()
+                attempt.record(health, True)
+                return model_name, result
+            attempt.record(health, False)
+        finally:
+            attempt.close(health)
+
+    raise AllModelsFailed(attempts)
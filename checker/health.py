@@ -0,0 +1,116 @@
+"""Shared health registry for the target_models fallback chain.
+
+Each model has a circuit breaker. Once a model keeps failing (or the key pool
+has no key with quota left for it) its circuit opens for a cooldown window and requests go
+straight to the next model instead of waiting for it to fail again. After
+the window one request is let through as a probe; success closes the circuit.
+"""
+import threading
+import time
+
+from checker.errors import QUOTA, TRANSIENT, UNKNOWN
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half-open"
+
+
+class _Circuit:
+    def __init__(self):
+        self.state = CLOSED
+        self.failures = 0
+        self.opened_until = 0.0
+        self.probe_until = 0.0
+        self.last_error = None
+        self.successes = 0
+        self.total_failures = 0
+
+
+class ModelHealth:
+    """Per-model circuit breakers, shared by every session in the process."""
+
+    # Consecutive failures of each kind before the circuit opens. Invalid keys
+    # and safety blocks say nothing about the model, so they never count; a
+    # QUOTA failure is only reported once no key in the pool can serve it.
+    THRESHOLDS = {QUOTA: 1, TRANSIENT: 3, UNKNOWN: 3}
+
+    def __init__(self, cooldowns=None, probe_window=30.0):
+        self.cooldowns = cooldowns or {QUOTA: 60.0, TRANSIENT: 30.0, UNKNOWN: 120.0}
+        self.probe_window = probe_window
+        self._circuits = {}
+        self._lock = threading.Lock()
+
+    def _circuit(self, model):
+        # Caller holds self._lock.
+        if model not in self._circuits:
+            self._circuits[model] = _Circuit()
+        return self._circuits[model]
+
+    def allow(self, model):
+        """Whether a request should try ``model`` now."""
+        with self._lock:
+            circuit = self._circuit(model)
+            now = time.time()
+            if circuit.state == CLOSED:
+                return True
+            if now < circuit.opened_until or now < circuit.probe_until:
+                return False
+            # Cooldown is over: let exactly one request probe the model.
+            circuit.state = HALF_OPEN
+            circuit.probe_until = now + self.probe_window
+            return True
+
+    def release_probe(self, model):
+        """Give up a half-open probe that ended without a result, so another request can probe."""
+        with self._lock:
+            circuit = self._circuit(model)
+            if circuit.state == HALF_OPEN:
+                circuit.probe_until = 0.0
+
+    def order(self, models):
+        """Closed/probe-ready models first, then open ones by soonest recovery."""
+        with self._lock:
+            now = time.time()
+            ready = [m for m in models if self._circuit(m).opened_until <= now]
+            waiting = sorted(
+                (m for m in models if self._circuit(m).opened_until > now),
+                key=lambda m: self._circuit(m).opened_until,
+            )
+        return ready + waiting
+
+    def record_success(self, model):
+        with self._lock:
+            circuit = self._circuit(model)
+            circuit.state = CLOSED
+            circuit.failures = 0
+            circuit.opened_until = 0.0
+            circuit.probe_until = 0.0
+            circuit.successes += 1
+
+    def record_failure(self, model, kind):
+        if kind not in self.THRESHOLDS:
+            return
+        with self._lock:
+            circuit = self._circuit(model)
+            circuit.failures += 1
+            circuit.total_failures += 1
+            circuit.last_error = kind
+            if circuit.state == HALF_OPEN or circuit.failures >= self.THRESHOLDS[kind]:
+                circuit.state = OPEN
+                circuit.opened_until = time.time() + self.cooldowns[kind]
+                circuit.probe_until = 0.0
+
+    def snapshot(self):
+        rows = []
+        with self._lock:
+            now = time.time()
+            for model, circuit in self._circuits.items():
+                rows.append({
+                    "Model": model,
+                    "Circuit": circuit.state,
+                    "Retry In": f"{max(0, int(circuit.opened_until - now))}s" if circuit.opened_until > now else "—",
+                    "OK": circuit.successes,
+                    "Failed": circuit.total_failures,
+                    "Last Error": circuit.last_error or "—",
+                })
+        return rows
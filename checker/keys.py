@@ -0,0 +1,162 @@
+"""Quota-aware scheduling over the district API key pool.
+
+Every session in the server process shares one KeyScheduler, so a key that
+just returned a 429 is rested for everyone instead of being picked again at
+random by the next student.
+"""
+import threading
+import time
+from datetime import datetime, timedelta
+from zoneinfo import ZoneInfo
+
+from checker.errors import INVALID_KEY, QUOTA, classify_error, is_daily_quota_error
+
+# Gemini daily quotas reset at midnight Pacific time (PST or PDT).
+_QUOTA_TZ = ZoneInfo("America/Los_Angeles")
+
+
+def _quota_day(now):
+    return datetime.fromtimestamp(now, _QUOTA_TZ).date().toordinal()
+
+
+def _seconds_until_reset(now):
+    tomorrow = datetime.fromtimestamp(now, _QUOTA_TZ).date() + timedelta(days=1)
+    midnight = datetime(tomorrow.year, tomorrow.month, tomorrow.day, tzinfo=_QUOTA_TZ)
+    return midnight.timestamp() - now
+
+
+def mask_key(key):
+    return f"…{key[-4:]}" if len(key) > 4 else "…"
+
+
+class _KeyState:
+    def __init__(self, key, rpm, now):
+        self.key = key
+        self.tokens = float(rpm)
+        self.refilled_at = now
+        self.day = _quota_day(now)
+        self.used_today = 0
+        self.in_flight = 0
+        self.errors = 0
+        self.cooldowns = {}  # model name (or None for every model) -> resume time
+
+
+class KeyScheduler:
+    """Per-key token buckets (RPM and RPD) with cooldowns and least-loaded picks."""
+
+    def __init__(self, keys, rpm=15, rpd=1000, cooldown=60.0, invalid_cooldown=3600.0):
+        self.rpm = rpm
+        self.rpd = rpd
+        self.cooldown = cooldown
+        self.invalid_cooldown = invalid_cooldown
+        now = time.time()
+        self._states = [_KeyState(key, rpm, now) for key in dict.fromkeys(keys)]
+        self._cond = threading.Condition()
+
+    def __len__(self):
+        return len(self._states)
+
+    # --- BOOKKEEPING ---
+    def _refresh(self, state, now):
+        # Caller holds self._cond.
+        state.tokens = min(self.rpm, state.tokens + (now - state.refilled_at) * self.rpm / 60.0)
+        state.refilled_at = now
+        day = _quota_day(now)
+        if day != state.day:
+            state.day = day
+            state.used_today = 0
+            state.cooldowns.clear()
+
+    def _cooling(self, state, model, now):
+        return any(
+            deadline > now
+            for scope, deadline in state.cooldowns.items()
+            if scope is None or scope == model
+        )
+
+    def _wait_time(self, state, model, now):
+        """Seconds until this key could serve ``model`` again."""
+        if state.used_today >= self.rpd:
+            return _seconds_until_reset(now)
+        waits = [
+            deadline - now
+            for scope, deadline in state.cooldowns.items()
+            if (scope is None or scope == model) and deadline > now
+        ]
+        if state.tokens < 1:
+            waits.append((1 - state.tokens) * 60.0 / self.rpm)
+        return max(waits, default=0.0)
+
+    # --- PUBLIC API ---
+    def acquire(self, model=None, timeout=0.0, exclude=()):
+        """Reserve the least-loaded usable key, waiting up to ``timeout`` seconds.
+
+        Returns None when no key becomes available in time. Every successful
+        acquire must be paired with ``release``.
+        """
+        deadline = time.time() + timeout
+        with self._cond:
+            while True:
+                now = time.time()
+                for state in self._states:
+                    self._refresh(state, now)
+                candidates = [
+                    s for s in self._states
+                    if s.key not in exclude
+                    and s.tokens >= 1
+                    and s.used_today < self.rpd
+                    and not self._cooling(s, model, now)
+                ]
+                if candidates:
+                    best = min(candidates, key=lambda s: (s.in_flight, -s.tokens, s.used_today))
+                    best.tokens -= 1
+                    best.used_today += 1
+                    best.in_flight += 1
+                    return best.key
+
+                waits = [self._wait_time(s, model, now) for s in self._states if s.key not in exclude]
+                remaining = deadline - now
+                if not waits or remaining <= 0 or min(waits) > remaining:
+                    return None
+                self._cond.wait(min(min(waits), remaining))
+
+    def release(self, key, error=None, model=None):
+        """Return a key to the pool, resting it if the call hit a quota limit.
+
+        Keys the API rejects outright are benched for every model.
+        """
+        kind = classify_error(error) if error is not None else None
+        with self._cond:
+            for state in self._states:
+                if state.key != key:
+                    continue
+                state.in_flight = max(0, state.in_flight - 1)
+                if error is not None:
+                    state.errors += 1
+                    now = time.time()
+                    if kind == QUOTA and is_daily_quota_error(error):
+                        state.cooldowns[model] = now + _seconds_until_reset(now)
+                    elif kind == QUOTA:
+                        state.cooldowns[model] = now + self.cooldown
+                    elif kind == INVALID_KEY:
+                        state.cooldowns[None] = now + self.invalid_cooldown
+                break
+            self._cond.notify_all()
+
+    def snapshot(self):
+        """Per-key utilisation for the sidebar diagnostics."""
+        rows = []
+        with self._cond:
+            now = time.time()
+            for state in self._states:
+                self._refresh(state, now)
+                cooling = [scope or "all models" for scope, deadline in state.cooldowns.items() if deadline > now]
+                rows.append({
+                    "Key": mask_key(state.key),
+                    "Active": state.in_flight,
+                    "RPM Used": f"{self.rpm - int(state.tokens)}/{self.rpm}",
+                    "Today": f"{state.used_today}/{self.rpd}",
+                    "Errors": state.errors,
+                    "Cooling Down": ", ".join(cooling) or "—",
+                })
+        return rows
@@ -0,0 +1,95 @@
+"""Map-reduce review for external packets too large for a single prompt.
+
+Each file (or section of a long file) is reviewed on its own, concurrently,
+and a final merge call turns the per-part findings into the usual STATUS and
+ACTION PLAN. Wall-clock time stays close to one call as long as the key
+pool can serve the parts in parallel.
+"""
+import asyncio
+
+from checker.budgeting import pack_parts
+
+
+def build_parts(files_by_type, max_tokens, estimator):
+    """Flatten ``{doc_type: [(file_name, text), ...]}`` into reviewable parts.
+
+    Long files are packed into sections of at most ``max_tokens``, split on
+    page and heading boundaries.
+    """
+    parts = []
+    for doc_type, files in files_by_type.items():
+        for name, text in files:
+            sections = pack_parts(text, max_tokens, estimator)
+            for number, section in enumerate(sections, start=1):
+                parts.append({
+                    "doc_type": doc_type,
+                    "name": name,
+                    "section": number,
+                    "sections": len(sections),
+                    "text": section,
+                })
+    return parts
+
+
+def describe_part(part):
+    label = f"{part['doc_type']}: {part['name']}"
+    if part["sections"] > 1:
+        label += f" (section {part['section']} of {part['sections']})"
+    return label
+
+
+def map_prompt(system_prompt, part):
+    return f"""{system_prompt}
+
+    You are reviewing ONE PART of a larger research packet. The other parts are
+    reviewed separately and the findings are merged afterwards.
+
+    List your compliance FINDINGS for this part only, as short bullets:
+    - FOUND: required items that are present here (quote the heading or phrase).
+    - GAP: required items that are missing or non-compliant here.
+    - PROHIBITED: any prohibited topic that appears here.
+    Do NOT write a STATUS line or an ACTION PLAN.
+
+--- {describe_part(part)} ---
+{part['text']}
+"""
+
+
+def reduce_prompt(system_prompt, parts, findings):
+    """Merge prompt; ``findings`` holds the map output (or an exception) per part."""
+    message = f"""{system_prompt}
+
+    This packet was too large to review in one pass, so each part was reviewed
+    separately. The findings for every part are below. A required item counts
+    as present if ANY part contains it. Combine them into ONE review using the
+    OUTPUT FORMAT above.
+"""
+    for part, finding in zip(parts, findings):
+        if isinstance(finding, Exception):
+            finding = "⚠️ This part could not be reviewed; ask the researcher to resubmit it."
+        message += f"\n--- FINDINGS: {describe_part(part)} ---\n{finding}\n"
+    return message
+
+
+async def review_parts(parts, review_part, concurrency, on_done=None):
+    """Run ``review_part(part)`` for every part, at most ``concurrency`` at a time.
+
+    Returns results in part order; a part that failed gets its exception.
+    ``on_done(finished_count, total)`` is called as parts complete.
+    """
+    semaphore = asyncio.Semaphore(max(1, concurrency))
+    finished = 0
+
+    async def run(part):
+        nonlocal finished
+        async with semaphore:
+            try:
+                result = await review_part(part)
+            except Exception as e:
+                result = e
+        finished += 1
+        if on_done:
+            on_done(finished, len(parts))
+        return result
+
+    return await asyncio.gather(*(run(part) for part in parts))
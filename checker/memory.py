@@ -0,0 +1,152 @@
+"""Memory caps for review requests.
+
+Every review reserves an estimate of its working set (PDF parsing plus the
+copies of extracted text that the prompt is built from) before it starts.
+``MemoryBudget`` turns away a request that is larger than one session may
+use, and holds back requests while the process as a whole is at its cap,
+rejecting them if no room frees up in time. Reservations are estimates;
+``process_memory`` reports what the process actually holds.
+"""
+import resource
+import sys
+import threading
+import time
+from contextlib import contextmanager
+
+SESSION = "session"
+GLOBAL = "global"
+
+# Copies of extracted text alive at once: per-file text, text per doc_type and the prompt.
+TEXT_COPIES = 3
+# Flate-compressed PDF text rarely expands more than this.
+TEXT_EXPANSION = 4
+
+# Idle sessions remembered for their peak before the oldest are forgotten.
+MAX_SESSIONS = 1000
+
+
+class MemoryLimitExceeded(Exception):
+    """Raised when a request doesn't fit; ``scope`` is SESSION or GLOBAL.
+
+    ``limit`` is what was still free in that scope.
+    """
+
+    def __init__(self, scope, requested, limit):
+        super().__init__(f"{scope} memory limit: {requested} bytes requested, {limit} allowed")
+        self.scope = scope
+        self.requested = requested
+        self.limit = limit
+
+
+def estimate_request_bytes(file_sizes, char_budget):
+    """Working-set estimate for reviewing PDFs of ``file_sizes`` bytes.
+
+    PyPDF2's parsed objects grow with the file; the text is capped by
+    ``char_budget`` characters per file and held ``TEXT_COPIES`` times.
+    """
+    return sum(size + TEXT_COPIES * min(char_budget, TEXT_EXPANSION * size) for size in file_sizes)
+
+
+def held_bytes(*values):
+    """Bytes held by the strings in ``values`` (nested dicts, lists and tuples included)."""
+    total = 0
+    stack = list(values)
+    while stack:
+        value = stack.pop()
+        if isinstance(value, (str, bytes)):
+            total += sys.getsizeof(value)
+        elif isinstance(value, dict):
+            stack.extend(value.values())
+        elif isinstance(value, (list, tuple)):
+            stack.extend(value)
+    return total
+
+
+def process_memory():
+    """``{"rss_bytes", "peak_rss_bytes"}`` for this process (rss is None where unavailable)."""
+    rss = None
+    peak = None
+    try:
+        with open("/proc/self/status", encoding="ascii") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    rss = int(line.split()[1]) * 1024
+                elif line.startswith("VmHWM:"):
+                    peak = int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    if peak is None:
+        # ru_maxrss is KB on Linux and bytes on macOS.
+        maxrss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        peak = maxrss if sys.platform == "darwin" else maxrss * 1024
+    return {"rss_bytes": rss, "peak_rss_bytes": peak}
+
+
+class MemoryBudget:
+    """Per-session and process-wide reservations, shared by every session."""
+
+    def __init__(self, total_bytes, session_bytes, wait=30.0):
+        self.total_bytes = total_bytes
+        self.session_bytes = min(session_bytes, total_bytes)
+        self.wait = wait
+        self._used = 0
+        self._peak = 0
+        self._sessions = {}       # session_id -> [reserved now, peak reserved]
+        self._rejected = {SESSION: 0, GLOBAL: 0}
+        self._cond = threading.Condition()
+
+    def check(self, nbytes):
+        """Raise MemoryLimitExceeded now if ``nbytes`` can never fit one session."""
+        if nbytes > self.session_bytes:
+            with self._cond:
+                self._rejected[SESSION] += 1
+            raise MemoryLimitExceeded(SESSION, nbytes, self.session_bytes)
+
+    @contextmanager
+    def reserve(self, session_id, nbytes):
+        """Hold ``nbytes`` for ``session_id`` for the duration of the block; yields seconds waited."""
+        self.check(nbytes)
+        started = time.monotonic()
+        deadline = started + self.wait
+        with self._cond:
+            session = self._sessions.pop(session_id, None) or [0, 0]
+            self._sessions[session_id] = session  # Most recently used last
+            while self._used + nbytes > self.total_bytes or session[0] + nbytes > self.session_bytes:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    # The session's own reviews still running are what's in the way.
+                    if session[0] + nbytes > self.session_bytes:
+                        self._rejected[SESSION] += 1
+                        raise MemoryLimitExceeded(SESSION, nbytes, self.session_bytes - session[0])
+                    self._rejected[GLOBAL] += 1
+                    raise MemoryLimitExceeded(GLOBAL, nbytes, self.total_bytes - self._used)
+                self._cond.wait(remaining)
+            self._used += nbytes
+            self._peak = max(self._peak, self._used)
+            session[0] += nbytes
+            session[1] = max(session[1], session[0])
+        try:
+            yield time.monotonic() - started
+        finally:
+            with self._cond:
+                self._used -= nbytes
+                session[0] -= nbytes
+                idle = [sid for sid, (now, _) in self._sessions.items() if not now]
+                for sid in idle[:max(0, len(self._sessions) - MAX_SESSIONS)]:
+                    del self._sessions[sid]
+                self._cond.notify_all()
+
+    def session_peak(self, session_id):
+        with self._cond:
+            return self._sessions.get(session_id, [0, 0])[1]
+
+    def snapshot(self):
+        with self._cond:
+            return {
+                "total_bytes": self.total_bytes,
+                "session_bytes": self.session_bytes,
+                "used_bytes": self._used,
+                "peak_bytes": self._peak,
+                "active_sessions": sum(1 for now, _ in self._sessions.values() if now),
+                "rejected": dict(self._rejected),
+            }
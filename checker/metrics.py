@@ -0,0 +1,314 @@
+"""Per-request instrumentation and process-wide metrics.
+
+Each "Run Compliance Check" fills in a ``RequestTrace``: time per stage,
+extraction time per file (and whether it was read to the end), prompt size,
+every model attempt with its latency and error class, token usage, memory
+and total wall time. Finished traces go to a ``MetricsRegistry`` that keeps
+the recent ones for JSON-lines export (and appends them to a log file if
+configured) and aggregates them into Prometheus text, served on
+``/metrics`` by ``start_metrics_server``.
+
+File names follow the "Last name, First name" naming standard, so traces
+leave the session only with each name replaced by a short hash.
+"""
+import hashlib
+import json
+import threading
+import time
+import uuid
+from collections import deque
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from checker.errors import classify_error
+
+OK = "ok"
+
+# Upper bounds (seconds) of the request latency histogram.
+LATENCY_BUCKETS = (1, 2, 5, 10, 20, 30, 60, 120, 300)
+
+
+class RequestTrace:
+    """Everything measured for one review request."""
+
+    def __init__(self, mode, session_id=None):
+        self.id = uuid.uuid4().hex[:12]
+        self.mode = mode
+        self.session_id = session_id
+        self.started_at = datetime.now(timezone.utc).isoformat(timespec="seconds")
+        self._started = time.perf_counter()
+        self.stages = {}
+        self.files = []
+        self.attempts = []
+        self.prompt_chars = 0
+        self.prompt_tokens_estimated = 0
+        self.prompt_tokens = 0
+        self.output_tokens = 0
+        self.memory = {}
+        self.source = None
+        self.outcome = None
+        self.total_seconds = None
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def stage(self, name):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add_stage(name, time.perf_counter() - started)
+
+    def add_stage(self, name, seconds):
+        with self._lock:
+            self.stages[name] = self.stages.get(name, 0.0) + seconds
+
+    def file(self, name, pages, chars, seconds, cached, complete=True):
+        """One extracted file; ``complete`` is False when it was cut off at the character limit."""
+        with self._lock:
+            self.files.append({"name": name, "pages": pages, "chars": chars, "seconds": seconds, "cached": cached,
+                               "complete": complete})
+
+    def prompt(self, chars, estimated_tokens):
+        self.prompt_chars = chars
+        self.prompt_tokens_estimated = estimated_tokens
+
+    def record_memory(self, **values):
+        """Memory figures in bytes (reserved, held, session peak, process RSS)."""
+        with self._lock:
+            self.memory.update(values)
+
+    def usage(self, response):
+        usage = getattr(response, "usage_metadata", None)
+        if usage is None:
+            return
+        with self._lock:
+            self.prompt_tokens += getattr(usage, "prompt_token_count", 0) or 0
+            self.output_tokens += getattr(usage, "candidates_token_count", 0) or 0
+
+    def _attempt(self, phase, model_name, started, result):
+        with self._lock:
+            self.attempts.append({
+                "phase": phase,
+                "model": model_name,
+                "seconds": time.perf_counter() - started,
+                "result": result,
+            })
+
+    def timed(self, call, phase="review"):
+        """Wrap a ``call(model_name, key)`` for generate_with_fallback so every attempt is recorded."""
+        def wrapper(model_name, key):
+            started = time.perf_counter()
+            try:
+                result = call(model_name, key)
+            except Exception as e:
+                self._attempt(phase, model_name, started, classify_error(e))
+                raise
+            self._attempt(phase, model_name, started, OK)
+            return result
+        return wrapper
+
+    def timed_async(self, call, phase="map"):
+        """Async twin of ``timed``."""
+        async def wrapper(model_name, key):
+            started = time.perf_counter()
+            try:
+                result = await call(model_name, key)
+            except Exception as e:
+                self._attempt(phase, model_name, started, classify_error(e))
+                raise
+            self._attempt(phase, model_name, started, OK)
+            return result
+        return wrapper
+
+    def finish(self, source, outcome):
+        self.source = source
+        self.outcome = outcome
+        self.total_seconds = time.perf_counter() - self._started
+
+    def to_dict(self, file_names=False):
+        """The trace as JSON-ready data; file names are hashed unless ``file_names``."""
+        with self._lock:
+            return {
+                "id": self.id,
+                "started_at": self.started_at,
+                "mode": self.mode,
+                "source": self.source,
+                "outcome": self.outcome,
+                "total_seconds": _round(self.total_seconds),
+                "stages": {name: _round(seconds) for name, seconds in self.stages.items()},
+                "files": [
+                    dict(f, name=f["name"] if file_names else _name_hash(f["name"]), seconds=_round(f["seconds"]))
+                    for f in self.files
+                ],
+                "prompt_chars": self.prompt_chars,
+                "prompt_tokens_estimated": self.prompt_tokens_estimated,
+                "prompt_tokens": self.prompt_tokens,
+                "output_tokens": self.output_tokens,
+                "attempts": [dict(a, seconds=_round(a["seconds"])) for a in self.attempts],
+                "memory": dict(self.memory),
+            }
+
+
+def _round(seconds):
+    return round(seconds, 3) if seconds is not None else None
+
+
+def _name_hash(name):
+    return hashlib.sha256(name.encode("utf-8")).hexdigest()[:12]
+
+
+class MetricsRegistry:
+    """Recent traces plus running totals, shared by every session in the process."""
+
+    def __init__(self, keep=500, log_path=None):
+        self.log_path = log_path
+        self._recent = deque(maxlen=keep)   # (session_id, JSON line)
+        self._lock = threading.Lock()
+        self._requests = {}        # (mode, source, outcome) -> count
+        self._latency = [0] * len(LATENCY_BUCKETS)
+        self._latency_sum = 0.0
+        self._latency_count = 0
+        self._stages = {}          # stage -> [seconds, count]
+        self._attempts = {}        # (model, result) -> [seconds, count]
+        self._pages = 0
+        self._extract_seconds = 0.0
+        self._truncated = 0
+        self._prompt_tokens = 0
+        self._output_tokens = 0
+        self._held_peak = 0
+        self._gauges = {}          # name -> (help, read)
+
+    def gauge(self, name, help_text, read):
+        """Export ``read()`` as a gauge, sampled on every scrape."""
+        self._gauges[name] = (help_text, read)
+
+    def record(self, trace):
+        row = trace.to_dict()
+        line = json.dumps(row, ensure_ascii=False)
+        with self._lock:
+            self._recent.append((trace.session_id, line))
+            key = (row["mode"], row["source"] or "none", row["outcome"] or "unknown")
+            self._requests[key] = self._requests.get(key, 0) + 1
+            total = row["total_seconds"] or 0.0
+            for index, bound in enumerate(LATENCY_BUCKETS):
+                if total <= bound:
+                    self._latency[index] += 1
+            self._latency_sum += total
+            self._latency_count += 1
+            for stage, seconds in row["stages"].items():
+                entry = self._stages.setdefault(stage, [0.0, 0])
+                entry[0] += seconds
+                entry[1] += 1
+            for attempt in row["attempts"]:
+                entry = self._attempts.setdefault((attempt["model"], attempt["result"]), [0.0, 0])
+                entry[0] += attempt["seconds"]
+                entry[1] += 1
+            for f in row["files"]:
+                self._truncated += not f["complete"]
+                if not f["cached"]:
+                    self._pages += f["pages"]
+                    self._extract_seconds += f["seconds"]
+            self._prompt_tokens += row["prompt_tokens"]
+            self._output_tokens += row["output_tokens"]
+            self._held_peak = max(self._held_peak, row["memory"].get("held_bytes") or 0)
+            if self.log_path:
+                with open(self.log_path, "a", encoding="utf-8") as log:
+                    log.write(line + "\n")
+
+    def jsonl(self, session_id=None):
+        """The recent traces, oldest first, one JSON object per line.
+
+        With ``session_id``, only the traces of that session.
+        """
+        with self._lock:
+            return "".join(
+                line + "\n" for owner, line in self._recent if session_id is None or owner == session_id
+            )
+
+    def prometheus(self):
+        """Prometheus text exposition format (version 0.0.4)."""
+        lines = []
+
+        def metric(name, kind, help_text, samples):
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {kind}")
+            for labels, value in samples:
+                label_text = ",".join(f'{k}="{_escape(v)}"' for k, v in labels.items())
+                lines.append(f"{name}{{{label_text}}} {value}" if label_text else f"{name} {value}")
+
+        with self._lock:
+            metric("bcs_requests_total", "counter", "Compliance checks by mode, result source and outcome.", [
+                ({"mode": mode, "source": source, "outcome": outcome}, count)
+                for (mode, source, outcome), count in sorted(self._requests.items())
+            ])
+            buckets = [({"le": str(bound)}, count) for bound, count in zip(LATENCY_BUCKETS, self._latency)]
+            buckets.append(({"le": "+Inf"}, self._latency_count))
+            lines.append("# HELP bcs_request_seconds Wall time of a compliance check.")
+            lines.append("# TYPE bcs_request_seconds histogram")
+            for labels, value in buckets:
+                lines.append(f'bcs_request_seconds_bucket{{le="{labels["le"]}"}} {value}')
+            lines.append(f"bcs_request_seconds_sum {self._latency_sum:.3f}")
+            lines.append(f"bcs_request_seconds_count {self._latency_count}")
+            metric("bcs_stage_seconds_total", "counter", "Time spent per request stage.", [
+                ({"stage": stage}, f"{seconds:.3f}") for stage, (seconds, _) in sorted(self._stages.items())
+            ])
+            metric("bcs_model_attempts_total", "counter", "Model calls by model and result (ok or error class).", [
+                ({"model": model, "result": result}, count)
+                for (model, result), (_, count) in sorted(self._attempts.items())
+            ])
+            metric("bcs_model_attempt_seconds_total", "counter", "Time spent in model calls by model and result.", [
+                ({"model": model, "result": result}, f"{seconds:.3f}")
+                for (model, result), (seconds, _) in sorted(self._attempts.items())
+            ])
+            metric("bcs_pdf_pages_total", "counter", "PDF pages parsed (cache misses only).", [({}, self._pages)])
+            metric("bcs_pdf_extract_seconds_total", "counter", "Time spent parsing PDFs.", [({}, f"{self._extract_seconds:.3f}")])
+            metric("bcs_pdf_truncated_total", "counter", "Files reviewed only up to the per-file character limit.",
+                   [({}, self._truncated)])
+            metric("bcs_prompt_tokens_total", "counter", "Prompt tokens reported by Gemini.", [({}, self._prompt_tokens)])
+            metric("bcs_output_tokens_total", "counter", "Output tokens reported by Gemini.", [({}, self._output_tokens)])
+            metric("bcs_request_held_bytes_max", "gauge", "Largest text working set of a single request.", [({}, self._held_peak)])
+            gauges = list(self._gauges.items())
+        for name, (help_text, read) in gauges:
+            # Read outside the lock; a gauge may take other locks.
+            value = read()
+            if value is not None:
+                metric(name, "gauge", help_text, [({}, value)])
+        return "\n".join(lines) + "\n"
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def start_metrics_server(registry, port, host="127.0.0.1"):
+    """Serve ``/metrics`` (Prometheus text) and ``/requests.jsonl`` from a daemon thread.
+
+    Both are unauthenticated, so the server listens on localhost unless
+    ``host`` says otherwise.
+    """
+
+    class Handler(BaseHTTPRequestHandler):
+        def log_message(self, *args):
+            pass
+
+        def do_GET(self):
+            path = self.path.split("?")[0]
+            if path == "/metrics":
+                body, content_type = registry.prometheus(), "text/plain; version=0.0.4; charset=utf-8"
+            elif path == "/requests.jsonl":
+                body, content_type = registry.jsonl(), "application/x-ndjson; charset=utf-8"
+            else:
+                self.send_error(404)
+                return
+            data = body.encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", content_type)
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+    server = ThreadingHTTPServer((host, port), Handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
@@ -0,0 +1,294 @@
+"""One complete compliance review without the Streamlit UI.
+
+``review_documents`` runs every step of "Run Compliance Check" (pre-screen,
+prompt budget, saved results, re-review of revisions, map-reduce for large
+external packets, the admission queue, the model fallback chain) and returns
+the outcome as a plain dict. app.py runs it with hooks that stream the answer
+into the page and fill in the request trace; the bulk-screening CLI and the
+benchmarks run the same function for every file.
+"""
+import asyncio
+import re
+import time
+from contextlib import nullcontext
+
+from checker.budgeting import PAGE_BREAK, budget_documents
+from checker.caching import response_key
+from checker.gemini import AllModelsFailed, generate_with_fallback, generate_with_fallback_async
+from checker.mapreduce import build_parts, map_prompt, reduce_prompt, review_parts
+from checker.memory import held_bytes
+from checker.prompts import GENERATION_CONFIG, SAFETY_SETTINGS, SYSTEM_PROMPTS, TARGET_MODELS
+from checker.revisions import plan_revision, revision_prompt
+from checker.rules import EXTERNAL, hints_for_model, render_strict_fail
+from checker.structured import parse_review, render_review, structured_config, structured_prompt
+
+FILE_CHAR_LIMIT = 400000            # Characters extracted per PDF before the budget decides what is sent
+PROMPT_TOKEN_BUDGET = 40000         # Document tokens per review call (~160k characters)
+PART_TOKEN_BUDGET = 10000           # Document tokens per part of a large external packet
+MODEL_INPUT_TOKEN_LIMIT = 1048576   # Input window of every model in target_models
+
+KEY_RETRIES = 3          # District keys to try per model before moving on
+KEY_WAIT_SECONDS = 5     # How long to wait for a key's rate limit to refill
+MAP_CONCURRENCY = 8      # Most packet parts reviewed at once (also capped by queue capacity)
+MAP_OUTPUT_TOKENS = 2048 # Per-part findings are short bullet lists
+
+PRESCREEN_MODEL = "instant pre-screen"
+
+_STATUS = re.compile(r"STATUS:\**\s*\[?\s*(?:✅|❌)?\s*(PASS|RECOMMEND FOR REVIEW|REVISION NEEDED)", re.IGNORECASE)
+
+
+def join_documents(files_by_type):
+    """``{doc_type: [(name, text), ...]}`` -> ``{doc_type: text}``, pages kept apart."""
+    return {
+        doc_type: PAGE_BREAK.join(text for _, text in files)
+        for doc_type, files in files_by_type.items()
+    }
+
+
+def document_token_budget(system_prompt, estimator, generation_config=GENERATION_CONFIG):
+    return min(
+        PROMPT_TOKEN_BUDGET,
+        MODEL_INPUT_TOKEN_LIMIT - estimator.count(system_prompt) - generation_config["max_output_tokens"]
+    )
+
+
+def build_user_message(system_prompt, documents, hints=""):
+    user_message = f"{system_prompt}\n\nAnalyze the following documents:\n"
+    for doc_type, clean_content in documents.items():
+        user_message += f"\n--- {doc_type} ---\n{clean_content}\n"
+    return user_message + hints
+
+
+def record_usage(estimator, prompt, response, trace=None):
+    # Real prompt token counts keep the local estimate calibrated.
+    usage = getattr(response, "usage_metadata", None)
+    if usage is not None and getattr(usage, "prompt_token_count", 0):
+        estimator.observe(len(prompt), usage.prompt_token_count)
+    if trace is not None:
+        trace.usage(response)
+
+
+def review_status(text):
+    """The STATUS verdict of a finished review ("PASS", "REVISION NEEDED", ...), or None."""
+    match = _STATUS.search(text or "")
+    return match.group(1).upper() if match else None
+
+
+def review_documents(files_by_type, mode, estimator, rule_engine, clients, key_scheduler=None, api_key=None,
+                     health=None, response_cache=None, force_fresh=False, short_circuit=True, on_status=None,
+                     history=None, structured=False, admission=None, session_id=None, on_wait=None,
+                     on_stream=None, on_prepared=None, trace=None):
+    """Review one submission; ``files_by_type`` is ``{doc_type: [(name, text), ...]}``.
+
+    ``clients`` is the ClientPool the model calls go through.
+
+    Returns a dict with ``ok``, ``model``, ``text``, ``status``, ``source``
+    ("prescreen", "cache", "revision" or "gemini"), ``review`` (the parsed
+    JSON review when ``structured`` is on, see checker/structured.py),
+    ``prescreen``, ``budget_report``, ``revision`` (see ``plan_revision``),
+    ``map_reduce`` (a large packet reviewed part by part instead of trimmed),
+    ``parts`` (how many parts), ``prompt_chars``
+    and ``prompt_tokens`` (the last prompt built), ``attempts`` (``(model,
+    kind, error)`` when every model failed), ``held_bytes`` (peak text held)
+    and ``seconds``.
+    Obvious strict fails are answered locally unless ``short_circuit`` is
+    off; ``on_status(message)`` reports progress. With a ReviewHistory as
+    ``history``, a revision of the last reviewed submission only sends what
+    changed, and the outcome becomes the next baseline.
+
+    Model calls wait in ``admission`` (an AdmissionQueue, as ``session_id``,
+    reporting ``on_wait(position, eta_seconds)``), holding one slot per packet
+    part reviewed at once. ``on_prepared(result)`` is called once the prompt
+    is ready, just before queueing. Unless ``structured``, ``on_stream(model,
+    text)`` streams the final answer: it gets "" when an attempt starts and the
+    text so far after every chunk. A RequestTrace as ``trace`` records the
+    stages, prompt size and every model attempt.
+    """
+    started = time.perf_counter()
+    report = on_status or (lambda message: None)
+    stage = trace.stage if trace is not None else lambda name: nullcontext()
+    system_prompt = SYSTEM_PROMPTS[mode]
+    # Packet parts are always reviewed as plain findings; only the final answer is JSON.
+    final_prompt = structured_prompt(system_prompt) if structured else system_prompt
+    generation_config = structured_config(mode) if structured else GENERATION_CONFIG
+    documents = join_documents(files_by_type)
+
+    with stage("prescreen"):
+        prescreen = rule_engine.scan(documents, mode)
+    hints = hints_for_model(prescreen)
+    result = {
+        "ok": False, "model": "", "text": None, "status": None, "source": None, "review": None,
+        "prescreen": prescreen, "budget_report": [], "revision": None, "map_reduce": False, "parts": 0,
+        "prompt_chars": 0, "prompt_tokens": 0, "attempts": [], "held_bytes": held_bytes(files_by_type, documents),
+    }
+    seen_in_full = False  # Only reviews of the whole text become a history baseline
+
+    def set_prompt(message):
+        result["prompt_chars"] = len(message)
+        result["prompt_tokens"] = estimator.count(message)
+        if trace is not None:
+            trace.prompt(result["prompt_chars"], result["prompt_tokens"])
+
+    def finish(**values):
+        result.update(values)
+        result["status"] = review_status(result["text"])
+        result["seconds"] = time.perf_counter() - started
+        if history is not None and result["ok"]:
+            history.record(mode, documents, result["text"], result["model"], result["status"], result["source"],
+                           baseline=seen_in_full)
+        return result
+
+    if prescreen["strict_fail"] and short_circuit and not force_fresh:
+        return finish(ok=True, model=PRESCREEN_MODEL, text=render_strict_fail(prescreen), source="prescreen")
+
+    budget = document_token_budget(final_prompt, estimator, generation_config)
+    # External packets that don't fit are reviewed part by part instead of trimmed.
+    use_map_reduce = result["map_reduce"] = mode == EXTERNAL and sum(map(estimator.count, documents.values())) > budget
+    with stage("budget"):
+        clean_documents, result["budget_report"] = budget_documents(documents, budget, estimator)
+    if use_map_reduce or not any(row["sections_dropped"] for row in result["budget_report"]):
+        seen_in_full = True
+    user_message = None
+    if not use_map_reduce:
+        user_message = build_user_message(final_prompt, clean_documents, hints)
+        set_prompt(user_message)
+        result["held_bytes"] = held_bytes(files_by_type, documents, clean_documents, user_message)
+
+    if use_map_reduce:
+        cache_keys = {
+            model_name: response_key(system_prompt, documents, f"map-reduce/{model_name}", generation_config, SAFETY_SETTINGS)
+            for model_name in TARGET_MODELS
+        }
+    else:
+        cache_keys = {
+            model_name: response_key(system_prompt, clean_documents, model_name, generation_config, SAFETY_SETTINGS)
+            for model_name in TARGET_MODELS
+        }
+    del clean_documents  # Already in user_message and the cache keys
+    if response_cache is not None and not force_fresh:
+        with stage("cache"):
+            for model_name in TARGET_MODELS:
+                saved = response_cache.get(cache_keys[model_name])
+                if saved:
+                    return finish(ok=True, model=model_name, text=saved["text"], review=saved.get("review"),
+                                  source="cache")
+
+    baseline = history.last(mode) if history is not None and not force_fresh else None
+    with stage("diff"):
+        revision = result["revision"] = plan_revision(baseline, documents, estimator, budget)
+    if revision is not None:
+        seen_in_full = True
+        if revision["unchanged"]:
+            return finish(ok=True, model=baseline["model"], text=baseline["text"], source="revision")
+        use_map_reduce = result["map_reduce"] = False
+        user_message = revision_prompt(final_prompt, baseline, revision["changes"]) + hints
+        set_prompt(user_message)
+
+    parts = []
+    map_concurrency = 1
+    if use_map_reduce:
+        parts = build_parts(files_by_type, PART_TOKEN_BUDGET, estimator)
+        result["parts"] = len(parts)
+        # Never more parallel calls than the queue has slots (or, unqueued, than there are keys).
+        if admission is not None:
+            pool_size = admission.capacity
+        else:
+            pool_size = len(key_scheduler) if key_scheduler is not None else 2
+        map_concurrency = min(MAP_CONCURRENCY, pool_size, len(parts))
+
+    if on_prepared is not None:
+        on_prepared(result)
+
+    chain = dict(key_scheduler=key_scheduler, api_key=api_key, health=health,
+                 key_retries=KEY_RETRIES, key_wait=KEY_WAIT_SECONDS)
+    # The district keys are shared, so only as many calls run at once as the
+    # pool can serve; a large packet holds one slot per part under review.
+    if admission is not None:
+        admitted = admission.admit(session_id, on_wait=on_wait, slots=map_concurrency)
+    else:
+        admitted = nullcontext()
+
+    with admitted as queue_seconds:
+        if queue_seconds is not None and trace is not None:
+            trace.add_stage("queue", queue_seconds)
+
+        if use_map_reduce:
+            map_config = dict(GENERATION_CONFIG, max_output_tokens=MAP_OUTPUT_TOKENS)
+            report(f"Large packet: reviewing {len(parts)} parts")
+
+            async def review_part(part):
+                prompt = map_prompt(system_prompt, part)
+
+                async def call_model_async(model_name, key):
+                    return await generate_text_async(clients, model_name, key, prompt, map_config, estimator, trace)
+
+                call = trace.timed_async(call_model_async) if trace is not None else call_model_async
+                _, findings = await generate_with_fallback_async(TARGET_MODELS, call, **chain)
+                return findings
+
+            with stage("map"):
+                findings = asyncio.run(review_parts(
+                    parts, review_part,
+                    concurrency=map_concurrency,
+                    on_done=lambda finished, total: report(f"Reviewed {finished} of {total} packet parts"),
+                ))
+            result["held_bytes"] = max(result["held_bytes"], held_bytes(files_by_type, documents, parts, findings))
+            errors = [f for f in findings if isinstance(f, Exception)]
+            if len(errors) == len(findings):
+                attempts = [a for e in errors if isinstance(e, AllModelsFailed) for a in e.attempts]
+                return finish(attempts=attempts)
+            user_message = reduce_prompt(final_prompt, parts, findings) + hints
+            set_prompt(user_message)
+            del parts, findings
+
+        def call_model(model_name, key):
+            if structured:
+                # Invalid JSON raises ValueError, so the next model gets a turn.
+                text = generate_text(clients, model_name, key, user_message, generation_config, estimator, trace)
+                return parse_review(text, mode)
+            if on_stream is not None:
+                return generate_text_stream(clients, model_name, key, user_message, generation_config, estimator,
+                                            lambda text: on_stream(model_name, text), trace)
+            return generate_text(clients, model_name, key, user_message, generation_config, estimator, trace)
+
+        report(f"Sending ~{result['prompt_tokens']:,} tokens to Gemini")
+        try:
+            with stage("generate"):
+                model_name, answer = generate_with_fallback(
+                    TARGET_MODELS, trace.timed(call_model) if trace is not None else call_model, **chain
+                )
+        except AllModelsFailed as e:
+            return finish(attempts=e.attempts)
+    review, text = (answer, render_review(answer)) if structured else (None, answer)
+    if revision is not None:
+        return finish(ok=True, model=model_name, text=text, review=review, source="revision")
+    if response_cache is not None:
+        response_cache.put(cache_keys[model_name], {"text": text, "review": review})
+    return finish(ok=True, model=model_name, text=text, review=review, source="gemini")
+
+
+def generate_text(clients, model_name, key, prompt, generation_config, estimator, trace=None):
+    model = clients.model(key, model_name, generation_config, SAFETY_SETTINGS)
+    response = model.generate_content(prompt)
+    record_usage(estimator, prompt, response, trace)
+    return response.text
+
+
+def generate_text_stream(clients, model_name, key, prompt, generation_config, estimator, on_text, trace=None):
+    """``generate_text`` that streams: ``on_text`` gets "" first, then the text so far after every chunk."""
+    model = clients.model(key, model_name, generation_config, SAFETY_SETTINGS)
+    on_text("")  # A stream can fail partway; the next attempt starts clean.
+    response = model.generate_content(prompt, stream=True)
+    parts = []
+    for chunk in response:
+        parts.append(chunk.text)
+        on_text("".join(parts))
+    record_usage(estimator, prompt, response, trace)
+    return "".join(parts)
+
+
+async def generate_text_async(clients, model_name, key, prompt, generation_config, estimator, trace=None):
+    model = clients.async_model(key, model_name, generation_config, SAFETY_SETTINGS)
+    response = await model.generate_content_async(prompt)
+    record_usage(estimator, prompt, response, trace)
+    return response.text
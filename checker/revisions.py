@@ -0,0 +1,176 @@
+"""Incremental re-review of revised submissions.
+
+Students fix their documents and re-run the check many times, and each
+revision is usually a few edited paragraphs. ``ReviewHistory`` keeps the
+text each doc_type had at the session's last full review, along with the
+review itself. When a revision comes in, ``plan_revision`` diffs it section
+by section (the same page and heading sections the prompt budget uses) and
+``revision_prompt`` sends only the changed sections plus the outstanding
+action steps, asking the model to carry the review forward.
+"""
+import difflib
+import re
+import time
+
+from checker.budgeting import TokenEstimator, split_chunks
+from checker.memory import held_bytes
+
+# Above this share of changed tokens a full review is cheaper to reason about.
+REVISION_MAX_SHARE = 0.5
+
+_ACTION_PLAN = re.compile(r"ACTION PLAN[^\n]*\n", re.IGNORECASE)
+_STEP = re.compile(r"^\s{0,3}[*-]\s+\*\*", re.MULTILINE)
+
+
+class ReviewHistory:
+    """One session's reviews; the last full review per mode is the diff baseline.
+
+    Pre-screen answers and reviews of trimmed documents are listed but never
+    become a baseline, since the model did not see the whole text. Baselines
+    live in the session for as long as it lasts, so one larger than
+    ``max_bytes`` is not kept (the next run is then a full review).
+    """
+
+    def __init__(self, keep=20, max_bytes=None):
+        self.keep = keep
+        self.max_bytes = max_bytes
+        self._runs = []
+        self._baselines = {}   # mode -> {"documents", "text", "model", "status"}
+
+    def record(self, mode, documents, text, model, status, source, baseline=True):
+        self._runs.append({
+            "time": time.strftime("%H:%M:%S"),
+            "mode": mode,
+            "documents": ", ".join(documents),
+            "status": status or "—",
+            "source": source,
+            "model": model,
+        })
+        del self._runs[:-self.keep]
+        if not baseline:
+            return
+        entry = {"documents": dict(documents), "text": text, "model": model, "status": status}
+        self._baselines.pop(mode, None)
+        if self.max_bytes is None or self.held_bytes() + held_bytes(entry) <= self.max_bytes:
+            self._baselines[mode] = entry
+
+    def held_bytes(self):
+        """Bytes of text the baselines keep alive."""
+        return held_bytes(self._baselines)
+
+    def last(self, mode):
+        return self._baselines.get(mode)
+
+    def rows(self):
+        return list(self._runs)
+
+
+def _normalize(text):
+    return " ".join(text.split())
+
+
+def diff_documents(previous, current, estimator):
+    """Compare ``{doc_type: text}`` against the baseline, section by section.
+
+    Returns one row per doc_type in either version: ``state`` ("new",
+    "changed", "unchanged" or "removed"), the ``changed`` chunks of the new
+    text, the ``removed`` headings and token counts.
+    """
+    # A fixed estimator, so calibration between runs doesn't move section boundaries.
+    splitter = TokenEstimator()
+    rows = []
+    for doc_type, text in current.items():
+        new_chunks = split_chunks(text, splitter)
+        tokens_total = sum(estimator.count(c["text"]) for c in new_chunks)
+        if doc_type not in previous:
+            rows.append({"doc_type": doc_type, "state": "new", "changed": new_chunks, "removed": [],
+                         "tokens_total": tokens_total, "tokens_changed": tokens_total})
+            continue
+        old_chunks = split_chunks(previous[doc_type], splitter)
+        matcher = difflib.SequenceMatcher(
+            None, [_normalize(c["text"]) for c in old_chunks], [_normalize(c["text"]) for c in new_chunks],
+            autojunk=False,
+        )
+        changed, removed = [], []
+        for op, i1, i2, j1, j2 in matcher.get_opcodes():
+            if op in ("replace", "insert"):
+                changed.extend(new_chunks[j1:j2])
+            elif op == "delete":
+                removed.extend(c["heading"] for c in old_chunks[i1:i2])
+        rows.append({
+            "doc_type": doc_type,
+            "state": "changed" if changed or removed else "unchanged",
+            "changed": changed,
+            "removed": list(dict.fromkeys(removed)),
+            "tokens_total": tokens_total,
+            "tokens_changed": sum(estimator.count(c["text"]) for c in changed),
+        })
+    for doc_type in previous:
+        if doc_type not in current:
+            rows.append({"doc_type": doc_type, "state": "removed", "changed": [], "removed": [],
+                         "tokens_total": 0, "tokens_changed": 0})
+    return rows
+
+
+def plan_revision(baseline, documents, estimator, budget):
+    """Decide whether ``documents`` can be reviewed as a revision of ``baseline``.
+
+    Returns None when a full review is needed (no baseline, or too much
+    changed), otherwise ``{"changes", "tokens_changed", "tokens_total",
+    "unchanged"}``.
+    """
+    if baseline is None:
+        return None
+    changes = diff_documents(baseline["documents"], documents, estimator)
+    tokens_changed = sum(row["tokens_changed"] for row in changes)
+    tokens_total = sum(row["tokens_total"] for row in changes)
+    if tokens_changed > budget or tokens_changed > REVISION_MAX_SHARE * tokens_total:
+        return None
+    return {
+        "changes": changes,
+        "tokens_changed": tokens_changed,
+        "tokens_total": tokens_total,
+        "unchanged": all(row["state"] == "unchanged" for row in changes),
+    }
+
+
+def action_steps(review_text):
+    """The action steps of a finished review, as written."""
+    match = _ACTION_PLAN.search(review_text or "")
+    if not match:
+        return (review_text or "").strip()
+    plan = review_text[match.end():]
+    first_step = _STEP.search(plan)
+    return plan[first_step.start() if first_step else 0:].strip()
+
+
+def revision_prompt(system_prompt, baseline, changes):
+    """Prompt for re-reviewing only what changed since ``baseline``."""
+    steps = action_steps(baseline["text"])
+    message = f"""{system_prompt}
+
+    This is a REVISED version of a submission you already reviewed. Your
+    previous action steps are listed below, followed by ONLY the sections that
+    changed since then; every section not shown is unchanged.
+
+    For each previous action step, decide from the changed sections whether it
+    is now resolved. Keep the steps that are still outstanding, drop the
+    resolved ones and add any new issue in the changed sections. Then write ONE
+    complete review of the whole submission using the OUTPUT FORMAT above.
+
+--- PREVIOUS ACTION STEPS ---
+{steps or "(none)"}
+"""
+    for row in changes:
+        if row["state"] == "removed":
+            message += f"\n--- {row['doc_type']} ---\n[This document was removed from the submission.]\n"
+            continue
+        if row["state"] == "unchanged":
+            continue
+        label = "new document" if row["state"] == "new" else "changed sections"
+        message += f"\n--- {row['doc_type']} ({label}) ---\n"
+        for chunk in row["changed"]:
+            message += f"[{chunk['heading']}, page {chunk['page']}]\n{chunk['text'].strip()}\n\n"
+        if row["removed"]:
+            message += f"[Sections removed: {'; '.join(row['removed'])}]\n"
+    return message
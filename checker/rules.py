@@ -0,0 +1,241 @@
+"""Instant keyword pre-screen for the hard rules in both system prompts.
+
+The prohibited-topic patterns are compiled into one alternation with a named
+group per rule, behind a lookahead on the rules' keyword stems, so each
+document is scanned for them in a single pass and most positions are
+rejected after one check. Required statements match across part of a line
+("destroyed ... 2027"), so they are searched for separately, one rule at a
+time, and can never swallow a prohibited term. Findings point at the
+page they were found on and are passed to Gemini as hints. Only a prohibited
+topic put to participants as a direct question on a survey or instrument
+("Do you own a gun?") is an obvious strict fail that can be reported without
+calling Gemini; every other match (a research question about gun violence, a
+student council vote) is left for the model to judge.
+"""
+import bisect
+import re
+
+from checker.budgeting import PAGE_BREAK
+
+STUDENT = "student"
+EXTERNAL = "external"
+
+PROHIBITED = "prohibited"
+REQUIRED = "required"
+
+_MONTHS = r"January|February|March|April|May|June|July|August|September|October|November|December"
+
+RULES = [
+    {
+        "id": "political",
+        "stems": ("political", "democrat", "republican"),
+        "kind": PROHIBITED,
+        "label": "Political affiliation",
+        "modes": (STUDENT, EXTERNAL),
+        "pattern": r"\bpolitical (?:party|affiliation|views?|beliefs?|leaning)\b|\b(?:democrat|republican)s?\b",
+        "direct": (
+            r"\byour (?:political (?:party|affiliation|views?|beliefs?|leaning)|party affiliation)\b"
+            r"|\b(?:are|do) you (?:a |consider yourself (?:a )?)?(?:democrat|republican)s?\b"
+        ),
+        "rationale": "Policy 6.4001 and the PPRA prohibit asking about political affiliation (Strict Fail).",
+    },
+    {
+        "id": "voting",
+        "stems": ("vot", "ballot", "election"),
+        "kind": PROHIBITED,
+        "label": "Voting history",
+        "modes": (STUDENT, EXTERNAL),
+        "pattern": r"\bvot(?:e|ed|es|ing|ers?)\b|\bballots?\b|\belections?\b",
+        # Class and club elections are school business, not voting history.
+        "direct": (
+            r"^(?![^\n]*\b(?:student council|class (?:officers?|president)|club|homecoming|prom)\b)"
+            r"[^\n]*(?:\b(?:did|do|will|would) you (?:usually |ever |plan to )?vote\b"
+            r"|\bwho did you vote for\b|\byour vot(?:e|ing)\b|\bare you registered to vote\b)"
+        ),
+        "rationale": "Policy 6.4001 prohibits questions about voting (Strict Fail).",
+    },
+    {
+        "id": "religion",
+        "stems": ("religio", "church", "pray", "worship", "denomination"),
+        "kind": PROHIBITED,
+        "label": "Religious practices",
+        "modes": (STUDENT, EXTERNAL),
+        "pattern": r"\breligio(?:n|ns|us)\b|\bchurch(?:es)?\b|\bpray(?:er|ers|ing)?\b|\bworship\b|\bdenominations?\b",
+        "direct": (
+            r"\byour (?:religio(?:n|us)|church|denomination|faith)\b|\bwhat religion\b"
+            r"|\bdo you (?:\w+ )?(?:attend church|go to church|pray|worship)\b"
+        ),
+        "rationale": "Policy 6.4001 and the PPRA prohibit questions about religious practices (Strict Fail).",
+    },
+    {
+        "id": "firearms",
+        "stems": ("firearm", "gun", "rifle", "pistol", "handgun", "ammunition"),
+        "kind": PROHIBITED,
+        "label": "Firearm ownership",
+        "modes": (STUDENT, EXTERNAL),
+        "pattern": r"\bfirearms?\b|\bguns?\b|\brifles?\b|\bpistols?\b|\bhandguns?\b|\bammunition\b",
+        "direct": (
+            r"\b(?:do|does) (?:you|your)\b[^\n?]{0,40}\b(?:own|have|keep) (?:a |an |any )?(?:\w+ ){0,2}"
+            r"(?:firearms?|guns?|rifles?|pistols?|handguns?|ammunition)\b(?! (?:violence|safety|control|laws?))"
+            r"|\byour (?:firearms?|guns?|rifles?|pistols?|handguns?)\b"
+            r"|\b(?:firearms?|guns?) (?:in|at) your (?:home|house)\b"
+        ),
+        "rationale": "Policy 6.4001 prohibits questions about firearm ownership (Strict Fail).",
+    },
+    {
+        "id": "destruction_date",
+        "stems": ("destr", "delet", "shred", "eras"),
+        "kind": REQUIRED,
+        "label": "Data destruction date",
+        "modes": (STUDENT,),
+        "pattern": (
+            r"\b(?:destroy|destroyed|destruction|delete|deleted|shred|shredded|erase|erased)\b"
+            r"[^\n]{0,120}?(?:\b(?:19|20)\d{2}\b|\b\d{1,2}/\d{1,2}/\d{2,4}\b|\b(?:" + _MONTHS + r")\b)"
+        ),
+        "action": "State the date (and method) by which research data will be destroyed.",
+        "rationale": "Policy 6.4001 requires a data destruction date and method to protect participant privacy.",
+    },
+    {
+        "id": "voluntary",
+        "stems": ("voluntar", "withdraw", "free"),
+        "kind": REQUIRED,
+        "label": "Voluntary participation statement",
+        "modes": (STUDENT, EXTERNAL),
+        "pattern": r"\bvoluntar(?:y|ily)\b|\bwithdraw\b|\bfree to (?:stop|decline|leave|skip)\b",
+        "action": "Add a statement that participation is voluntary and participants may withdraw at any time.",
+        "rationale": "Federal research ethics (45 CFR 46) and Policy 6.4001 require voluntary participation.",
+    },
+    {
+        "id": "blount_value",
+        "stems": ("projected", "value", "benefit"),
+        "kind": REQUIRED,
+        "label": "Projected value to Blount County",
+        "modes": (EXTERNAL,),
+        "pattern": r"\b(?:projected )?(?:value|benefits?)\b[^\n]{0,100}?\bBlount County\b",
+        "action": "Explicitly state the projected value of the study to Blount County Schools.",
+        "rationale": "District research regulations require every external study to state its projected value to Blount County.",
+    },
+]
+
+# Prohibited topics only count as an obvious fail where participants are asked
+# about them: on the instruments themselves, not in a proposal's research
+# questions or a consent form promising not to ask.
+_QUESTION_DOC_TYPES = {"SURVEY", "INSTRUMENTS"}
+
+
+class RuleEngine:
+    def __init__(self, rules=RULES):
+        self.rules = {rule["id"]: rule for rule in rules}
+        prohibited = [rule for rule in rules if rule["kind"] == PROHIBITED]
+        stems = "|".join(stem for rule in prohibited for stem in rule["stems"])
+        alternatives = "|".join(f"(?P<{rule['id']}>{rule['pattern']})" for rule in prohibited)
+        # Every pattern starts at a word boundary with one of its stems.
+        self._pattern = re.compile(rf"\b(?=(?:{stems}))(?:{alternatives})", re.IGNORECASE)
+        # One location is enough to show a statement exists, so each is a single search.
+        self._required = {
+            rule["id"]: re.compile(rule["pattern"], re.IGNORECASE)
+            for rule in rules if rule["kind"] == REQUIRED
+        }
+        self._direct = {
+            rule["id"]: re.compile(rule["direct"], re.IGNORECASE)
+            for rule in rules if rule.get("direct")
+        }
+
+    def scan(self, documents, mode):
+        """Scan ``{doc_type: text}``.
+
+        Returns ``{"findings", "missing", "strict_fail"}``: every match with
+        its doc_type, page, line and whether it is a direct question to
+        participants on a survey or instrument; the required rules nothing
+        matched; and whether any prohibited topic is asked about that way.
+        """
+        findings = []
+        seen = set()
+        for doc_type, text in documents.items():
+            page_starts = [0] + [m.end() for m in re.finditer(PAGE_BREAK, text)]
+            matches = [(match.lastgroup, match) for match in self._pattern.finditer(text)]
+            for rule_id, pattern in self._required.items():
+                if mode in self.rules[rule_id]["modes"]:
+                    match = pattern.search(text)
+                    if match:
+                        matches.append((rule_id, match))
+            for rule_id, match in matches:
+                rule = self.rules[rule_id]
+                if mode not in rule["modes"]:
+                    continue
+                line_start = max(text.rfind("\n", 0, match.start()), text.rfind(PAGE_BREAK, 0, match.start())) + 1
+                line_end = min((i for i in (text.find("\n", match.end()), text.find(PAGE_BREAK, match.end())) if i != -1),
+                               default=len(text))
+                line = text[line_start:line_end].strip()
+                findings.append({
+                    "rule": rule["id"],
+                    "kind": rule["kind"],
+                    "label": rule["label"],
+                    "rationale": rule["rationale"],
+                    "doc_type": doc_type,
+                    "page": bisect.bisect_right(page_starts, match.start()),
+                    "match": match.group(),
+                    "line": line[:160],
+                    "question": self._asks_participants(rule, doc_type, line),
+                })
+                seen.add(rule["id"])
+
+        missing = [
+            rule for rule in self.rules.values()
+            if rule["kind"] == REQUIRED and mode in rule["modes"] and rule["id"] not in seen
+        ]
+        strict_fail = any(f["kind"] == PROHIBITED and f["question"] for f in findings)
+        return {"findings": findings, "missing": missing, "strict_fail": strict_fail}
+
+    def _asks_participants(self, rule, doc_type, line):
+        direct = self._direct.get(rule["id"])
+        return bool(
+            direct and doc_type in _QUESTION_DOC_TYPES and "?" in line and direct.search(line)
+        )
+
+
+def hints_for_model(result):
+    """Pre-screen findings as a prompt section Gemini can verify."""
+    lines = []
+    for finding in result["findings"]:
+        if finding["kind"] == PROHIBITED:
+            line = (
+                f"- Possible prohibited topic ({finding['label']}) in {finding['doc_type']}, "
+                f"page {finding['page']}: \"{finding['line']}\""
+            )
+            if line not in lines:
+                lines.append(line)
+    for rule in result["missing"]:
+        lines.append(f"- No match found for required item: {rule['label']}.")
+    if not lines:
+        return ""
+    return (
+        "\n--- AUTOMATED PRE-SCREEN HINTS (keyword scan; confirm each against the documents) ---\n"
+        + "\n".join(lines) + "\n"
+    )
+
+
+def render_strict_fail(result):
+    """Local review in the portal's usual output format, for obvious strict fails.
+
+    Only the prohibited questions are listed; the full AI review (which also
+    checks the required statements) runs once they are fixed.
+    """
+    steps = []
+    for finding in result["findings"]:
+        if finding["kind"] == PROHIBITED and finding["question"]:
+            step = (
+                f"Remove the question about {finding['label'].lower()} "
+                f"({finding['doc_type']}, page {finding['page']}: \"{finding['line']}\").",
+                finding["rationale"],
+            )
+            if step not in steps:
+                steps.append(step)
+
+    lines = ["- STATUS: [❌ REVISION NEEDED]", "- ACTION PLAN & RATIONALE:"]
+    for number, (action, rationale) in enumerate(steps, start=1):
+        lines.append(f"  * **[Action Step {number}]:** {action}")
+        lines.append(f"    * *Rationale:* \"{rationale}\"")
+    lines.append("")
+    lines.append("*⚡ Found by the instant pre-screen. Fix these items and re-run for the full AI review.*")
+    return "\n".join(lines)
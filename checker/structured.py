@@ -0,0 +1,130 @@
+"""Structured (JSON) review output.
+
+With structured output on, Gemini answers with a JSON object following
+``review_schema(mode)`` instead of free-form markdown: the status, who the
+participants are, and one entry per action step with its rationale and the
+policies it cites. ``render_review`` turns that back into the usual STATUS /
+ACTION PLAN markdown locally, so the page reads the same, while the object
+itself can be saved, counted across a class and checked without parsing
+prose. The schema also keeps answers short, which cuts output tokens.
+"""
+import json
+
+from checker.prompts import GENERATION_CONFIG
+from checker.rules import EXTERNAL, STUDENT
+
+STATUSES = {
+    STUDENT: ["PASS", "REVISION NEEDED"],
+    EXTERNAL: ["RECOMMEND FOR REVIEW", "REVISION NEEDED"],
+}
+PASSING = {"PASS", "RECOMMEND FOR REVIEW"}
+SUBJECTS = {
+    "MINORS": "Minors (students under 18)",
+    "ADULTS": "Adults (18+)",
+    "BOTH": "Minors and adults",
+    "UNCLEAR": "Unclear from the documents",
+}
+
+# A JSON review is a fraction of the markdown one; truncation shows up as invalid JSON.
+STRUCTURED_OUTPUT_TOKENS = 4096
+
+STRUCTURED_INSTRUCTIONS = """
+
+    **RESPONSE FORMAT:** Reply with JSON that follows the response schema
+    instead of the OUTPUT FORMAT above. Put each Action Step in
+    `action_steps`: `instruction` is one sentence saying what to fix,
+    `rationale` is one sentence saying why, `citations` names the policies or
+    laws relied on (e.g. "Policy 6.4001", "FERPA"). Use an empty list when
+    nothing needs fixing.
+    """
+
+
+def _enum(values, description):
+    return {"type": "STRING", "format": "enum", "enum": list(values), "description": description}
+
+
+def review_schema(mode):
+    """Gemini response schema for a review in ``mode``."""
+    return {
+        "type": "OBJECT",
+        "properties": {
+            "status": _enum(STATUSES[mode], "Overall verdict."),
+            "subjects": _enum(SUBJECTS, "Who the participants are (SUBJECT TRIAGE)."),
+            "action_steps": {
+                "type": "ARRAY",
+                "items": {
+                    "type": "OBJECT",
+                    "properties": {
+                        "document": {"type": "STRING", "description": "Document the step applies to, e.g. SURVEY."},
+                        "instruction": {"type": "STRING"},
+                        "rationale": {"type": "STRING"},
+                        "citations": {"type": "ARRAY", "items": {"type": "STRING"}},
+                    },
+                    "required": ["instruction", "rationale"],
+                },
+            },
+        },
+        "required": ["status", "subjects", "action_steps"],
+    }
+
+
+def structured_config(mode, generation_config=GENERATION_CONFIG):
+    return dict(
+        generation_config,
+        max_output_tokens=min(generation_config["max_output_tokens"], STRUCTURED_OUTPUT_TOKENS),
+        response_mime_type="application/json",
+        response_schema=review_schema(mode),
+    )
+
+
+def structured_prompt(system_prompt):
+    return system_prompt + STRUCTURED_INSTRUCTIONS
+
+
+def parse_review(text, mode):
+    """Validate a JSON review; raises ValueError so the fallback chain tries the next model."""
+    # Messages stay free of model output: digits like "500" would read as a server error.
+    try:
+        review = json.loads(text)
+    except json.JSONDecodeError:
+        raise ValueError("Structured review is not valid JSON") from None
+    if not isinstance(review, dict):
+        raise ValueError("Structured review is not a JSON object")
+    status = str(review.get("status", "")).upper()
+    if status not in STATUSES[mode]:
+        raise ValueError("Structured review has no valid status")
+    subjects = str(review.get("subjects", "")).upper()
+    steps = []
+    for step in review.get("action_steps") or []:
+        if not isinstance(step, dict) or not str(step.get("instruction", "")).strip():
+            continue
+        steps.append({
+            "document": str(step.get("document") or "").strip(),
+            "instruction": str(step["instruction"]).strip(),
+            "rationale": str(step.get("rationale") or "").strip(),
+            "citations": [str(c).strip() for c in step.get("citations") or [] if str(c).strip()],
+        })
+    return {
+        "status": status,
+        "subjects": subjects if subjects in SUBJECTS else "UNCLEAR",
+        "action_steps": steps,
+    }
+
+
+def render_review(review):
+    """The review in the markdown OUTPUT FORMAT of the system prompts."""
+    icon = "✅" if review["status"] in PASSING else "❌"
+    lines = [
+        f"- STATUS: [{icon} {review['status']}]",
+        f"- SUBJECTS: {SUBJECTS[review['subjects']]}",
+        "- ACTION PLAN & RATIONALE:",
+    ]
+    for number, step in enumerate(review["action_steps"], start=1):
+        where = f" ({step['document']})" if step["document"] else ""
+        lines.append(f"  * **[Action Step {number}]:** {step['instruction']}{where}")
+        if step["rationale"]:
+            cited = f" ({'; '.join(step['citations'])})" if step["citations"] else ""
+            lines.append(f"    * *Rationale:* \"{step['rationale']}\"{cited}")
+    if not review["action_steps"]:
+        lines.append("  * No action needed.")
+    return "\n".join(lines)
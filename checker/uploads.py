@@ -0,0 +1,80 @@
+"""PDFs on disk instead of in memory.
+
+Uploads are copied to a temporary file in 1 MiB chunks (hashing as they go),
+and PDFs are parsed through a read-only memory map of that file. The OS pages
+the file in and out as PyPDF2 walks it, so no extra copy of the upload lives
+on the Python heap, and a process-pool worker is sent the path rather than
+the bytes. The bulk CLI reads its folder the same way without copying.
+"""
+import hashlib
+import mmap
+import os
+import tempfile
+from contextlib import contextmanager
+
+CHUNK_BYTES = 1024 * 1024
+
+
+class PdfSource:
+    """A PDF file on disk; ``sha256`` matches ``content_key`` of its bytes.
+
+    Picklable, so it can be handed to ExtractionPool workers. ``close``
+    removes the file only if it is a spooled copy.
+    """
+
+    def __init__(self, name, path, size, sha256, owned=False):
+        self.name = name
+        self.path = path
+        self.size = size
+        self.sha256 = sha256
+        self.owned = owned
+
+    @classmethod
+    def spool(cls, name, stream, spool_dir=None):
+        """Copy a binary stream (e.g. a Streamlit UploadedFile) to a temporary file."""
+        digest = hashlib.sha256()
+        size = 0
+        if hasattr(stream, "seek"):
+            stream.seek(0)
+        with tempfile.NamedTemporaryFile(prefix="bcs-upload-", suffix=".pdf", dir=spool_dir, delete=False) as f:
+            try:
+                for chunk in iter(lambda: stream.read(CHUNK_BYTES), b""):
+                    digest.update(chunk)
+                    f.write(chunk)
+                    size += len(chunk)
+            except BaseException:
+                f.close()
+                os.remove(f.name)
+                raise
+        return cls(name, f.name, size, digest.hexdigest(), owned=True)
+
+    @classmethod
+    def from_path(cls, path):
+        digest = hashlib.sha256()
+        with open(path, "rb") as f:
+            for chunk in iter(lambda: f.read(CHUNK_BYTES), b""):
+                digest.update(chunk)
+        return cls(os.path.basename(path), path, os.path.getsize(path), digest.hexdigest())
+
+    @contextmanager
+    def open(self):
+        """A read-only memory map of the file (a plain file object if it is empty)."""
+        with open(self.path, "rb") as f:
+            if self.size == 0:
+                yield f
+                return
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+                yield mapped
+
+    def close(self):
+        if self.owned:
+            try:
+                os.remove(self.path)
+            except OSError:
+                pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
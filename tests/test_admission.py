@@ -0,0 +1,65 @@
+import threading
+import time
+
+from checker.admission import AdmissionQueue
+
+
+def _hold(queue, session_id, slots, started, release):
+    with queue.admit(session_id, slots=slots, poll=0.01):
+        started.set()
+        release.wait(5)
+
+
+def _start(queue, session_id, slots=1):
+    started, release = threading.Event(), threading.Event()
+    thread = threading.Thread(target=_hold, args=(queue, session_id, slots, started, release))
+    thread.start()
+    return started, release, thread
+
+
+def test_wide_job_holds_one_slot_per_call():
+    queue = AdmissionQueue(4)
+    started, release, thread = _start(queue, "packet", slots=3)
+    assert started.wait(1)
+    assert queue.snapshot()["running"] == 3
+
+    other_started, other_release, other = _start(queue, "a", slots=2)
+    time.sleep(0.05)
+    assert not other_started.is_set(), "only one slot is free"
+
+    release.set()
+    thread.join()
+    assert other_started.wait(1)
+    other_release.set()
+    other.join()
+    assert queue.snapshot()["running"] == 0
+
+
+def test_slots_are_capped_at_capacity():
+    queue = AdmissionQueue(2)
+    started, release, thread = _start(queue, "packet", slots=8)
+    assert started.wait(1)
+    assert queue.snapshot()["running"] == 2
+    release.set()
+    thread.join()
+
+
+def test_wide_job_at_head_is_not_overtaken():
+    queue = AdmissionQueue(2)
+    first_started, first_release, first = _start(queue, "a")
+    assert first_started.wait(1)
+    wide_started, wide_release, wide = _start(queue, "b", slots=2)
+    time.sleep(0.05)
+    narrow_started, narrow_release, narrow = _start(queue, "c")
+    time.sleep(0.05)
+    assert not wide_started.is_set() and not narrow_started.is_set()
+
+    first_release.set()
+    first.join()
+    assert wide_started.wait(1)
+    assert not narrow_started.is_set()
+    wide_release.set()
+    wide.join()
+    assert narrow_started.wait(1)
+    narrow_release.set()
+    narrow.join()
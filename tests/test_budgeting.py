@@ -0,0 +1,98 @@
+from checker.budgeting import (
+    PAGE_BREAK, TokenEstimator, allocate, budget_documents, fit_document, split_chunks,
+)
+
+
+def _chunk(text, page=1, heading="Page 1", tokens=10):
+    return {"page": page, "heading": heading, "text": text, "tokens": tokens}
+
+
+# --- allocate ---
+
+def test_allocate_splits_by_weight():
+    assert allocate({"a": 1000, "b": 1000}, 300, weights={"a": 2.0, "b": 1.0}) == {"a": 200, "b": 100}
+
+
+def test_allocate_shares_out_the_surplus_of_small_documents():
+    allocation = allocate({"small": 50, "big1": 1000, "big2": 1000}, 600, weights={})
+    assert allocation["small"] == 50
+    assert allocation["big1"] == allocation["big2"] == 275
+
+
+def test_allocate_gives_everything_when_it_fits():
+    assert allocate({"a": 10, "b": 20}, 1000) == {"a": 10, "b": 20}
+
+
+# --- split_chunks ---
+
+def test_split_chunks_keeps_page_numbers_and_headings():
+    text = "Intro line\nINFORMED CONSENT\nParents sign here." + PAGE_BREAK + "Second page text."
+    chunks = split_chunks(text, TokenEstimator())
+    assert [(c["page"], c["heading"]) for c in chunks] == [
+        (1, "Page 1"), (1, "INFORMED CONSENT"), (2, "Page 2"),
+    ]
+    assert "".join(c["text"] for c in chunks) == text.replace(PAGE_BREAK, "")
+
+
+def test_split_chunks_cuts_long_sections_at_sentences():
+    text = "This is one sentence. " * 200
+    chunks = split_chunks(text, TokenEstimator(), max_tokens=100)
+    assert len(chunks) > 1
+    assert all(c["tokens"] <= 101 for c in chunks)
+    assert all(c["text"].rstrip().endswith(".") for c in chunks[:-1])
+
+
+# --- fit_document ---
+
+def test_fit_document_keeps_everything_within_budget():
+    chunks = [_chunk("a "), _chunk("b ")]
+    text, kept = fit_document(chunks, 20)
+    assert text == "a b "
+    assert kept == {0, 1}
+
+
+def test_fit_document_keeps_opening_and_priority_sections_first():
+    chunks = [
+        _chunk("Title. ", page=1),
+        _chunk("Background reading. ", page=2),
+        _chunk("Consent is voluntary; you may withdraw. ", page=3),
+        _chunk("Timeline. ", page=4),
+    ]
+    text, kept = fit_document(chunks, 20)
+    assert kept == {0, 2}
+    assert "Consent is voluntary" in text and "Background" not in text
+    assert "[… part of page 2 omitted to fit the review budget …]" in text
+    assert text.endswith("[… part of page 4 omitted to fit the review budget …]\n")
+
+
+def test_fit_document_notes_a_run_of_dropped_pages_once():
+    chunks = [_chunk("Start. ", page=1), _chunk("x", page=2), _chunk("y", page=3), _chunk("Risks. ", page=4)]
+    text, kept = fit_document(chunks, 20)
+    assert kept == {0, 3}
+    assert text.count("omitted") == 1
+    assert "pages 2-3" in text
+
+
+# --- budget_documents ---
+
+def test_budget_documents_reports_what_was_left_out():
+    consent = "Parents give consent and may withdraw at any time. " * 40
+    filler = "Lorem ipsum dolor sit amet. " * 200
+    proposal = PAGE_BREAK.join([
+        "TITLE PAGE\n" + consent,
+        "LITERATURE REVIEW\n" + filler,
+        "DATA RETENTION\nData will be destroyed after the study. " * 10,
+    ])
+    estimator = TokenEstimator()
+    fitted, report = budget_documents({"PROPOSAL": proposal, "SURVEY": "Q1. How often do you read?"}, 1500, estimator)
+
+    rows = {row["doc_type"]: row for row in report}
+    assert rows["SURVEY"]["sections_dropped"] == 0
+    assert fitted["SURVEY"] == "Q1. How often do you read?"
+    row = rows["PROPOSAL"]
+    assert row["sections_dropped"] > 0
+    assert row["tokens_kept"] <= row["budget"] < row["tokens_total"]
+    assert row["pages_dropped"] == [2]
+    assert row["headings_dropped"] == ["LITERATURE REVIEW"]
+    assert "Data will be destroyed" in fitted["PROPOSAL"]
+    assert "omitted to fit the review budget" in fitted["PROPOSAL"]
@@ -0,0 +1,89 @@
+import os
+
+from checker import caching
+from checker.caching import ContentCache, response_key
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_entries_expire_after_ttl(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(caching.time, "time", clock)
+    cache = ContentCache(ttl=60)
+    cache.put("k", "value")
+    clock.now += 59
+    assert cache.get("k") == "value"
+    clock.now += 2
+    assert cache.get("k") is None
+    assert cache.stats()["entries"] == 0 and cache.stats()["bytes"] == 0
+
+
+def test_least_recently_used_entry_is_evicted_by_count():
+    cache = ContentCache(max_entries=2)
+    cache.put("a", "1")
+    cache.put("b", "2")
+    assert cache.get("a") == "1"
+    cache.put("c", "3")
+    assert cache.get("b") is None
+    assert cache.get("a") == "1" and cache.get("c") == "3"
+    assert cache.stats()["evictions"] == 1
+
+
+def test_entries_are_evicted_by_size():
+    cache = ContentCache(max_bytes=10)
+    cache.put("a", "x" * 6)
+    cache.put("b", "y" * 6)
+    assert cache.get("a") is None
+    assert cache.get("b") == "y" * 6
+    assert cache.stats()["bytes"] == 6
+    cache.put("huge", "z" * 11)
+    assert cache.get("huge") is None, "values larger than the cache are not kept"
+    assert cache.get("b") == "y" * 6
+
+
+def test_disk_tier_survives_a_restart(tmp_path):
+    ContentCache(disk_dir=str(tmp_path)).put("k", {"text": "review"})
+    restarted = ContentCache(disk_dir=str(tmp_path))
+    assert restarted.get("k") == {"text": "review"}
+    assert restarted.get("k") == {"text": "review"}
+    stats = restarted.stats()
+    assert (stats["disk_hits"], stats["hits"], stats["misses"]) == (1, 1, 0)
+
+
+def test_expired_disk_entries_are_removed(tmp_path, monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(caching.time, "time", clock)
+    ContentCache(disk_dir=str(tmp_path), ttl=60).put("k", "old")
+    clock.now += 61
+    assert ContentCache(disk_dir=str(tmp_path), ttl=60).get("k") is None
+    assert not (tmp_path / "k.json").exists()
+
+
+def test_disk_tier_is_pruned_oldest_first(tmp_path):
+    cache = ContentCache(disk_dir=str(tmp_path))
+    for age, key in enumerate(["old", "mid"]):
+        cache.put(key, "x" * 40)
+        os.utime(tmp_path / f"{key}.json", (1000 + age, 1000 + age))
+    cache.max_disk_bytes = 2 * (tmp_path / "old.json").stat().st_size + 10  # Room for two entries
+    cache.put("new", "x" * 40)
+    assert sorted(os.listdir(tmp_path)) == ["mid.json", "new.json"]
+
+
+def test_unreadable_disk_entry_is_a_miss(tmp_path):
+    (tmp_path / "k.json").write_text("{not json", encoding="utf-8")
+    assert ContentCache(disk_dir=str(tmp_path)).get("k") is None
+
+
+def test_response_key_ignores_whitespace_and_document_order():
+    config, safety = {"temperature": 0.0}, []
+    key = response_key("Review this.", {"A": "one two", "B": "three"}, "m", config, safety)
+    assert response_key("Review  this.\n", {"B": "three\n", "A": "one\n\ntwo"}, "m", config, safety) == key
+    assert response_key("Review this.", {"A": "one two", "B": "four"}, "m", config, safety) != key
+    assert response_key("Review this.", {"A": "one two", "B": "three"}, "m2", config, safety) != key
+    assert response_key("Review this.", {"A": "one two", "B": "three"}, "m", {"temperature": 1.0}, safety) != key
@@ -0,0 +1,51 @@
+import asyncio
+import inspect
+
+import google.generativeai as genai
+from google.generativeai import client as genai_client
+
+from checker.clients import ClientPool
+
+# ClientPool reaches into these SDK internals (see checker/clients.py); if an
+# upgrade renames them, these tests fail before the portal does.
+
+
+def test_sdk_internals_still_exist():
+    manager = genai_client._ClientManager()
+    for name in ("configure", "get_default_client", "make_client"):
+        assert callable(getattr(manager, name, None)), f"_ClientManager.{name} is gone"
+    model = genai.GenerativeModel("gemini-test")
+    for name in ("_client", "_async_client"):
+        assert hasattr(model, name), f"GenerativeModel.{name} is gone"
+    assert "api_key" in inspect.signature(manager.configure).parameters
+
+
+def test_models_are_bound_to_their_key():
+    pool = ClientPool(transport="rest")
+    first = pool.model("key-1", "gemini-test", {}, [])
+    assert pool.model("key-1", "gemini-test", {}, []) is first
+    second = pool.model("key-2", "gemini-test", {}, [])
+    assert second is not first
+    assert first._client is not None and second._client is not first._client
+
+
+def test_least_recently_used_key_is_forgotten():
+    pool = ClientPool(max_keys=2, transport="rest")
+    pool.model("a", "gemini-test", {}, [])
+    pool.model("b", "gemini-test", {}, [])
+    pool.model("a", "gemini-test", {}, [])
+    pool.model("c", "gemini-test", {}, [])
+    assert len(pool) == 2
+    assert {key for key, *_ in pool._models} == {"a", "c"}
+
+
+def test_async_models_are_kept_per_loop():
+    pool = ClientPool()
+
+    async def get():
+        return pool.async_model("key", "gemini-test", {}, [])
+
+    first = asyncio.run(get())
+    assert first._async_client is not None
+    assert asyncio.run(get()) is not first
+    assert len(pool._async_models) == 1, "models of closed loops are dropped"
@@ -0,0 +1,171 @@
+import asyncio
+
+import pytest
+
+from checker.errors import QUOTA, TRANSIENT
+from checker.gemini import AllModelsFailed, _ModelAttempt, generate_with_fallback, generate_with_fallback_async
+from checker.health import CLOSED, HALF_OPEN, OPEN, ModelHealth
+from checker.keys import KeyScheduler
+
+
+class ResourceExhausted(Exception):
+    pass
+
+
+class ServiceUnavailable(Exception):
+    pass
+
+
+class RerunException(BaseException):
+    """Stands in for Streamlit's script-control exceptions."""
+
+
+def _active(scheduler):
+    return [row["Active"] for row in scheduler.snapshot()]
+
+
+def _no_sleep(seconds):
+    pass
+
+
+# --- _ModelAttempt ---
+
+def test_quota_retries_on_another_key():
+    scheduler = KeyScheduler(["k1", "k2", "k3"])
+    attempt = _ModelAttempt("m", [], scheduler, None, key_retries=3, transient_retries=2)
+    assert attempt.got_key(scheduler.acquire("m"))
+    assert attempt.failed(ResourceExhausted("429 quota")) == (attempt.RETRY, 0.0)
+    assert attempt.keys_left()
+    assert attempt.held_key is None
+
+
+def test_transient_retries_same_key_then_moves_on():
+    attempt = _ModelAttempt("m", [], None, "personal", key_retries=3, transient_retries=1)
+    action, delay = attempt.failed(ServiceUnavailable("503"))
+    assert action == attempt.RETRY and delay >= 0
+    assert attempt.failed(ServiceUnavailable("503"))[0] == attempt.NEXT_MODEL
+
+
+def test_invalid_personal_key_ends_walk():
+    attempt = _ModelAttempt("m", [], None, "personal", key_retries=3, transient_retries=2)
+    with pytest.raises(AllModelsFailed):
+        attempt.failed(Exception("API key not valid"))
+
+
+def test_close_releases_held_key():
+    scheduler = KeyScheduler(["k1"])
+    attempt = _ModelAttempt("m", [], scheduler, None, key_retries=3, transient_retries=2)
+    attempt.got_key(scheduler.acquire("m"))
+    assert _active(scheduler) == [1]
+    attempt.close(None)
+    assert _active(scheduler) == [0]
+
+
+# --- Key release on interruption ---
+
+def test_base_exception_mid_call_releases_key():
+    scheduler = KeyScheduler(["k1", "k2"])
+
+    def call(model_name, key):
+        raise RerunException()
+
+    with pytest.raises(RerunException):
+        generate_with_fallback(["m"], call, key_scheduler=scheduler, sleep=_no_sleep)
+    assert _active(scheduler) == [0, 0]
+
+
+def test_cancelled_async_call_releases_key():
+    scheduler = KeyScheduler(["k1"])
+
+    async def call(model_name, key):
+        await asyncio.sleep(10)
+
+    async def main():
+        task = asyncio.create_task(generate_with_fallback_async(["m"], call, key_scheduler=scheduler))
+        await asyncio.sleep(0.1)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+
+    asyncio.run(main())
+    assert _active(scheduler) == [0]
+
+
+def test_interrupted_probe_is_released():
+    health = ModelHealth(cooldowns={QUOTA: 0.0, TRANSIENT: 0.0})
+    for _ in range(3):
+        health.record_failure("m", TRANSIENT)
+
+    def call(model_name, key):
+        raise RerunException()
+
+    with pytest.raises(RerunException):
+        generate_with_fallback(["m"], call, api_key="k", health=health, sleep=_no_sleep)
+    assert health.allow("m"), "the next request should get the probe"
+
+
+# --- Circuit breaker ---
+
+def test_per_key_quota_does_not_open_circuit():
+    scheduler = KeyScheduler([f"k{i}" for i in range(25)])
+    health = ModelHealth()
+    calls = []
+
+    def call(model_name, key):
+        calls.append((model_name, key))
+        if model_name == "pro":
+            raise ResourceExhausted("429 Resource has been exhausted")
+        return "ok"
+
+    assert generate_with_fallback(["pro", "flash"], call, key_scheduler=scheduler, health=health,
+                                  sleep=_no_sleep) == ("flash", "ok")
+    assert len([c for c in calls if c[0] == "pro"]) == 3
+    assert health.allow("pro")
+    assert {row["Model"]: row["Circuit"] for row in health.snapshot()}["pro"] == CLOSED
+
+
+def test_quota_opens_circuit_when_pool_has_no_key():
+    scheduler = KeyScheduler(["k1"])
+    health = ModelHealth()
+    key = scheduler.acquire("pro")
+    scheduler.release(key, error=ResourceExhausted("429 quota"), model="pro")
+
+    assert generate_with_fallback(["pro", "flash"], lambda m, k: "ok", key_scheduler=scheduler, health=health,
+                                  key_wait=0.0, sleep=_no_sleep) == ("flash", "ok")
+    assert not health.allow("pro")
+
+
+def test_personal_key_quota_does_not_open_circuit():
+    health = ModelHealth()
+
+    def call(model_name, key):
+        if model_name == "pro":
+            raise ResourceExhausted("429 quota")
+        return "ok"
+
+    generate_with_fallback(["pro", "flash"], call, api_key="personal", health=health, sleep=_no_sleep)
+    assert health.allow("pro")
+
+
+def test_transient_failures_open_then_probe_closes():
+    health = ModelHealth(cooldowns={TRANSIENT: 0.0})
+    for _ in range(2):
+        health.record_failure("m", TRANSIENT)
+    assert health.allow("m")
+    health.record_failure("m", TRANSIENT)
+    states = {row["Model"]: row["Circuit"] for row in health.snapshot()}
+    assert states["m"] == OPEN
+
+    assert health.allow("m")                      # Cooldown over: one probe.
+    assert not health.allow("m")                  # Only one at a time.
+    assert health.snapshot()[0]["Circuit"] == HALF_OPEN
+    health.record_success("m")
+    assert health.snapshot()[0]["Circuit"] == CLOSED
+
+
+def test_failed_probe_reopens():
+    health = ModelHealth(cooldowns={TRANSIENT: 60.0}, probe_window=30.0)
+    circuit = health._circuit("m")
+    circuit.state = HALF_OPEN
+    health.record_failure("m", TRANSIENT)
+    assert not health.allow("m")
@@ -0,0 +1,39 @@
+from datetime import datetime, timezone
+
+from checker.keys import KeyScheduler, _quota_day, _seconds_until_reset
+
+
+class ResourceExhausted(Exception):
+    pass
+
+
+def _ts(*args):
+    return datetime(*args, tzinfo=timezone.utc).timestamp()
+
+
+def test_reset_is_pacific_midnight_in_daylight_time():
+    # 2026-09-15 22:00 PDT (UTC-7) is 05:00 UTC; the reset is two hours away.
+    assert _seconds_until_reset(_ts(2026, 9, 16, 5, 0)) == 2 * 3600
+
+
+def test_reset_is_pacific_midnight_in_standard_time():
+    # 2026-12-15 22:00 PST (UTC-8) is 06:00 UTC.
+    assert _seconds_until_reset(_ts(2026, 12, 16, 6, 0)) == 2 * 3600
+
+
+def test_reset_across_dst_change():
+    # 2026-11-01 is 25 hours long in Los Angeles; 00:30 PDT is 07:30 UTC.
+    assert _seconds_until_reset(_ts(2026, 11, 1, 7, 30)) == 24.5 * 3600
+
+
+def test_quota_day_changes_at_pacific_midnight():
+    assert _quota_day(_ts(2026, 9, 16, 6, 59)) == _quota_day(_ts(2026, 9, 15, 7, 0))
+    assert _quota_day(_ts(2026, 9, 16, 7, 0)) == _quota_day(_ts(2026, 9, 16, 6, 59)) + 1
+
+
+def test_daily_quota_benches_key_for_that_model_only():
+    scheduler = KeyScheduler(["k1"])
+    key = scheduler.acquire("pro")
+    scheduler.release(key, error=ResourceExhausted("429 quota exceeded: requests per day"), model="pro")
+    assert scheduler.acquire("pro") is None
+    assert scheduler.acquire("flash") == "k1"
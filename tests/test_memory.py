@@ -0,0 +1,66 @@
+import threading
+
+import pytest
+
+from checker.memory import GLOBAL, SESSION, MemoryBudget, MemoryLimitExceeded
+from checker.revisions import ReviewHistory
+
+
+def test_oversized_request_is_rejected_for_the_session():
+    budget = MemoryBudget(total_bytes=1000, session_bytes=100, wait=0.0)
+    with pytest.raises(MemoryLimitExceeded) as info:
+        with budget.reserve("s", 150):
+            pass
+    assert info.value.scope == SESSION
+
+
+def test_overlapping_reviews_in_one_session_raise_session():
+    budget = MemoryBudget(total_bytes=1000, session_bytes=100, wait=0.05)
+    with budget.reserve("s", 80):
+        with pytest.raises(MemoryLimitExceeded) as info:
+            with budget.reserve("s", 50):
+                pass
+    assert info.value.scope == SESSION
+    assert info.value.limit == 20
+    assert budget.snapshot()["rejected"] == {SESSION: 1, GLOBAL: 0}
+
+
+def test_full_process_raises_global():
+    budget = MemoryBudget(total_bytes=100, session_bytes=80, wait=0.05)
+    with budget.reserve("a", 80):
+        with pytest.raises(MemoryLimitExceeded) as info:
+            with budget.reserve("b", 50):
+                pass
+    assert info.value.scope == GLOBAL
+
+
+def test_waiting_request_runs_once_room_frees_up():
+    budget = MemoryBudget(total_bytes=100, session_bytes=100, wait=5.0)
+    admitted = threading.Event()
+    release = threading.Event()
+
+    def first():
+        with budget.reserve("a", 80):
+            admitted.set()
+            release.wait(5)
+
+    thread = threading.Thread(target=first)
+    thread.start()
+    admitted.wait(1)
+    threading.Timer(0.05, release.set).start()
+    with budget.reserve("b", 50) as waited:
+        assert waited > 0
+    thread.join()
+    assert budget.snapshot()["used_bytes"] == 0
+
+
+def test_history_keeps_no_baseline_over_its_cap():
+    history = ReviewHistory(max_bytes=10_000)
+    history.record("student", {"PROPOSAL": "x" * 1000}, "review", "m", "PASS", "gemini")
+    assert history.last("student") is not None
+    assert 1000 < history.held_bytes() < 10_000
+
+    history.record("student", {"PROPOSAL": "x" * 20_000}, "review", "m", "PASS", "gemini")
+    assert history.last("student") is None
+    assert history.held_bytes() == 0
+    assert len(history.rows()) == 2
@@ -0,0 +1,35 @@
+from checker.metrics import MetricsRegistry, RequestTrace
+
+
+def _trace(session_id, file_name="Doe, Jane - Proposal.pdf"):
+    trace = RequestTrace("student", session_id=session_id)
+    trace.file(file_name, pages=2, chars=100, seconds=0.1, cached=False)
+    trace.finish("gemini", "ok")
+    return trace
+
+
+def test_exported_traces_hash_file_names():
+    registry = MetricsRegistry()
+    registry.record(_trace("a"))
+    exported = registry.jsonl()
+    assert "Doe" not in exported
+    assert _trace("a").to_dict(file_names=True)["files"][0]["name"] == "Doe, Jane - Proposal.pdf"
+
+
+def test_jsonl_filters_by_session():
+    registry = MetricsRegistry()
+    registry.record(_trace("a"))
+    registry.record(_trace("b"))
+    registry.record(_trace("a"))
+    assert len(registry.jsonl("a").splitlines()) == 2
+    assert len(registry.jsonl("b").splitlines()) == 1
+    assert len(registry.jsonl().splitlines()) == 3
+
+
+def test_truncated_files_are_traced_and_counted():
+    registry = MetricsRegistry()
+    trace = _trace("a")
+    trace.file("Doe, Jane - Packet.pdf", pages=120, chars=400000, seconds=2.0, cached=True, complete=False)
+    registry.record(trace)
+    assert [f["complete"] for f in trace.to_dict()["files"]] == [True, False]
+    assert "bcs_pdf_truncated_total 1" in registry.prometheus()
@@ -0,0 +1,95 @@
+import asyncio
+
+from checker.admission import AdmissionQueue
+from checker.budgeting import TokenEstimator
+from checker.keys import KeyScheduler
+from checker.metrics import RequestTrace
+from checker.review import review_documents
+from checker.rules import EXTERNAL, STUDENT, RuleEngine
+
+REVIEW = "- STATUS: [✅ PASS]\n- ACTION PLAN & RATIONALE:\n  * No action needed."
+
+
+class Response:
+    def __init__(self, text):
+        self.text = text
+        self.usage_metadata = None
+
+    def __iter__(self):
+        # Streamed in two chunks.
+        middle = len(self.text) // 2
+        return iter([Response(self.text[:middle]), Response(self.text[middle:])])
+
+
+class FakeClients:
+    """Stands in for ClientPool; records how many async calls run at once."""
+
+    def __init__(self):
+        self.running = 0
+        self.most_running = 0
+        self.queue_running = []
+        self.admission = None
+
+    def model(self, key, model_name, generation_config, safety_settings):
+        return self
+
+    def async_model(self, key, model_name, generation_config, safety_settings):
+        return self
+
+    def generate_content(self, prompt, stream=False):
+        return Response(REVIEW)
+
+    async def generate_content_async(self, prompt):
+        self.running += 1
+        self.most_running = max(self.most_running, self.running)
+        if self.admission is not None:
+            self.queue_running.append(self.admission.snapshot()["running"])
+        await asyncio.sleep(0.01)
+        self.running -= 1
+        return Response("- FOUND: consent statement")
+
+
+def _review(files_by_type, mode, clients, **kwargs):
+    return review_documents(files_by_type, mode, TokenEstimator(), RuleEngine(), clients, **kwargs)
+
+
+def test_streamed_answer_reaches_the_hook_and_the_trace():
+    streamed = []
+    trace = RequestTrace(STUDENT)
+    result = _review(
+        {"PROPOSAL": [("p.pdf", "Students answer a survey about reading habits.")]}, STUDENT, FakeClients(),
+        api_key="k", on_stream=lambda model_name, text: streamed.append(text), trace=trace,
+    )
+    assert result["ok"] and result["source"] == "gemini"
+    assert result["text"] == REVIEW and result["status"] == "PASS"
+    assert streamed == ["", REVIEW[:len(REVIEW) // 2], REVIEW]
+    row = trace.to_dict()
+    assert [a["result"] for a in row["attempts"]] == ["ok"]
+    assert {"prescreen", "budget", "generate"} <= set(row["stages"])
+    assert row["prompt_tokens_estimated"] == result["prompt_tokens"] > 0
+
+
+def test_prepared_hook_runs_before_the_model_is_called():
+    seen = []
+    _review(
+        {"PROPOSAL": [("p.pdf", "Students answer a survey about reading habits.")]}, STUDENT, FakeClients(),
+        api_key="k", on_prepared=lambda result: seen.append(result["budget_report"]),
+    )
+    assert len(seen) == 1 and seen[0]
+
+
+def test_large_packet_parts_hold_queue_slots():
+    section = "METHODS\nParticipants complete a voluntary survey about their reading. " * 400
+    packet = {"FULL_PROPOSAL": [(f"part{n}.pdf", section) for n in range(8)]}
+    clients = FakeClients()
+    clients.admission = admission = AdmissionQueue(3)
+    result = _review(
+        packet, EXTERNAL, clients,
+        key_scheduler=KeyScheduler([f"k{n}" for n in range(10)]), admission=admission, session_id="s",
+    )
+    assert result["ok"] and result["map_reduce"]
+    assert result["parts"] > 3
+    # Capped by the queue, not the (larger) key pool, and every running call holds a slot.
+    assert clients.most_running == 3
+    assert set(clients.queue_running) == {3}
+    assert admission.snapshot()["running"] == 0
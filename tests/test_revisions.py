@@ -0,0 +1,116 @@
+from checker.budgeting import PAGE_BREAK, TokenEstimator
+from checker.revisions import ReviewHistory, action_steps, diff_documents, plan_revision
+
+PROPOSAL = PAGE_BREAK.join([
+    "INTRODUCTION\nThis study looks at reading habits of high school students.",
+    "METHODS\nStudents answer an anonymous online survey during homeroom.",
+    "DATA RETENTION\nResponses are destroyed one year after the study ends.",
+    "REFERENCES\nSmith, J. (2020). Reading in the digital age.",
+])
+
+REVIEW = """**STATUS:** REVISION NEEDED
+
+### 📝 ACTION PLAN
+Please address the following:
+* **Consent:** Add a parent consent form.
+* **Survey:** Remove the question about religion.
+"""
+
+
+def _rows(previous, current):
+    return {row["doc_type"]: row for row in diff_documents(previous, current, TokenEstimator())}
+
+
+# --- diff_documents ---
+
+def test_diff_reports_every_state():
+    rows = _rows(
+        {"PROPOSAL": PROPOSAL, "SURVEY": "Q1. How often do you read?", "PERMISSION_FORM": "Principal signs."},
+        {"PROPOSAL": PROPOSAL.replace("one year", "two years"), "SURVEY": "Q1. How often do you read?",
+         "CONSENT_FORMS": "Parents sign here."},
+    )
+    assert rows["PROPOSAL"]["state"] == "changed"
+    assert [c["heading"] for c in rows["PROPOSAL"]["changed"]] == ["DATA RETENTION"]
+    assert rows["SURVEY"]["state"] == "unchanged"
+    assert rows["SURVEY"]["tokens_changed"] == 0
+    assert rows["CONSENT_FORMS"]["state"] == "new"
+    assert rows["CONSENT_FORMS"]["tokens_changed"] == rows["CONSENT_FORMS"]["tokens_total"]
+    assert rows["PERMISSION_FORM"]["state"] == "removed"
+
+
+def test_diff_ignores_whitespace_changes():
+    rows = _rows({"PROPOSAL": PROPOSAL}, {"PROPOSAL": PROPOSAL.replace(" study ", "  study\n")})
+    assert rows["PROPOSAL"]["state"] == "unchanged"
+
+
+def test_diff_lists_removed_sections():
+    shorter = PROPOSAL.split(PAGE_BREAK)
+    del shorter[3]
+    rows = _rows({"PROPOSAL": PROPOSAL}, {"PROPOSAL": PAGE_BREAK.join(shorter)})
+    assert rows["PROPOSAL"]["state"] == "changed"
+    assert rows["PROPOSAL"]["removed"] == ["REFERENCES"]
+    assert rows["PROPOSAL"]["changed"] == []
+
+
+# --- plan_revision ---
+
+def test_no_baseline_means_full_review():
+    assert plan_revision(None, {"PROPOSAL": PROPOSAL}, TokenEstimator(), 40000) is None
+
+
+def test_small_edit_is_a_revision():
+    baseline = {"documents": {"PROPOSAL": PROPOSAL}, "text": REVIEW, "model": "m", "status": "REVISION NEEDED"}
+    plan = plan_revision(baseline, {"PROPOSAL": PROPOSAL.replace("one year", "two years")}, TokenEstimator(), 40000)
+    assert plan is not None and not plan["unchanged"]
+    assert 0 < plan["tokens_changed"] < plan["tokens_total"] / 2
+
+
+def test_identical_documents_are_unchanged():
+    baseline = {"documents": {"PROPOSAL": PROPOSAL}, "text": REVIEW, "model": "m", "status": "REVISION NEEDED"}
+    plan = plan_revision(baseline, {"PROPOSAL": PROPOSAL}, TokenEstimator(), 40000)
+    assert plan["unchanged"]
+    assert plan["tokens_changed"] == 0
+
+
+def test_more_than_half_changed_means_full_review():
+    baseline = {"documents": {"PROPOSAL": PROPOSAL}, "text": REVIEW, "model": "m", "status": "REVISION NEEDED"}
+    sections = PROPOSAL.split(PAGE_BREAK)
+    rewritten = PAGE_BREAK.join([sections[0]] + [s + " Revised." for s in sections[1:]])
+    assert plan_revision(baseline, {"PROPOSAL": rewritten}, TokenEstimator(), 40000) is None
+
+
+def test_changes_over_the_budget_mean_full_review():
+    baseline = {"documents": {"PROPOSAL": PROPOSAL}, "text": REVIEW, "model": "m", "status": "REVISION NEEDED"}
+    edited = {"PROPOSAL": PROPOSAL.replace("one year", "two years")}
+    assert plan_revision(baseline, edited, TokenEstimator(), 1) is None
+
+
+# --- action_steps ---
+
+def test_action_steps_are_taken_from_the_action_plan():
+    steps = action_steps(REVIEW)
+    assert steps.startswith("* **Consent:**")
+    assert steps.endswith("question about religion.")
+    assert "Please address" not in steps
+
+
+def test_action_steps_without_a_plan_return_the_whole_review():
+    assert action_steps("  STATUS: PASS  ") == "STATUS: PASS"
+    assert action_steps(None) == ""
+
+
+# --- ReviewHistory ---
+
+def test_only_full_reviews_become_a_baseline():
+    history = ReviewHistory()
+    history.record("student", {"PROPOSAL": PROPOSAL}, REVIEW, "m", "REVISION NEEDED", "gemini")
+    history.record("student", {"PROPOSAL": "other"}, "STATUS: FAIL", "pre-screen", None, "prescreen", baseline=False)
+    assert history.last("student")["documents"] == {"PROPOSAL": PROPOSAL}
+    assert len(history.rows()) == 2
+
+
+def test_baselines_over_max_bytes_are_not_kept():
+    history = ReviewHistory(max_bytes=100)
+    history.record("student", {"PROPOSAL": PROPOSAL}, REVIEW, "m", "REVISION NEEDED", "gemini")
+    assert history.last("student") is None
+    assert history.held_bytes() == 0
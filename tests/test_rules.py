@@ -0,0 +1,83 @@
+import pytest
+
+from checker.rules import EXTERNAL, STUDENT, RuleEngine, hints_for_model, render_strict_fail
+
+
+@pytest.fixture(scope="module")
+def engine():
+    return RuleEngine()
+
+
+@pytest.mark.parametrize("line", [
+    "Do you own a gun?",
+    "Does your family keep any firearms at home?",
+    "Did you vote in the last presidential election?",
+    "What is your political party?",
+    "Are you a Democrat or a Republican?",
+    "How often do you attend church?",
+    "What religion do you practice?",
+])
+def test_direct_survey_question_is_strict_fail(engine, line):
+    result = engine.scan({"SURVEY": f"1. {line}\n"}, STUDENT)
+    assert result["strict_fail"]
+    assert "Remove the question about" in render_strict_fail(result)
+
+
+@pytest.mark.parametrize("doc_type, line", [
+    ("PROPOSAL", "How does exposure to gun violence in the news affect students' sense of safety at school?"),
+    ("PROPOSAL", "Did you vote in the student council election?"),
+    ("SURVEY", "Did you vote in the student council election?"),
+    ("SURVEY", "How safe do you feel from gun violence at school?"),
+    ("SURVEY", "Do you have any worries about gun violence near school?"),
+    ("SURVEY", "Which club elections have you followed this year?"),
+    ("PARENT_CONSENT", "Will you be asked about your religion? No."),
+    ("SURVEY", "We will not ask about your political party."),
+])
+def test_indirect_mentions_are_hints_only(engine, doc_type, line):
+    result = engine.scan({doc_type: line}, STUDENT)
+    assert result["findings"], "the topic should still be passed to the model"
+    assert not result["strict_fail"]
+    assert not any(f["question"] for f in result["findings"])
+
+
+def test_full_proposal_research_question_is_not_strict_fail(engine):
+    text = "Research question: Do rural students who own guns feel safer at school?"
+    result = engine.scan({"FULL_PROPOSAL": text}, EXTERNAL)
+    assert not result["strict_fail"]
+
+
+def test_instruments_question_in_external_mode(engine):
+    result = engine.scan({"INSTRUMENTS": "Q4. Do you or your parents own a handgun?"}, EXTERNAL)
+    assert result["strict_fail"]
+
+
+@pytest.mark.parametrize("mode, doc_type, text, rule_id", [
+    (EXTERNAL, "INSTRUMENTS", "Benefit: do you own a gun? It helps Blount County.", "firearms"),
+    (STUDENT, "PROPOSAL", "Data will be destroyed after we ask about your church and 2027.", "religion"),
+])
+def test_required_statement_does_not_hide_prohibited_term(engine, mode, doc_type, text, rule_id):
+    result = engine.scan({doc_type: text}, mode)
+    rules = {f["rule"] for f in result["findings"]}
+    assert rule_id in rules
+    assert any(f["kind"] == "required" for f in result["findings"])
+    assert engine.rules[rule_id]["label"] in hints_for_model(result)
+
+
+def test_required_statement_span_keeps_strict_fail(engine):
+    result = engine.scan({"INSTRUMENTS": "Benefit: do you own a gun? It helps Blount County."}, EXTERNAL)
+    assert result["strict_fail"]
+    assert "Firearm ownership" in hints_for_model(result)
+
+
+def test_finding_reports_page(engine):
+    result = engine.scan({"SURVEY": "Intro page\fDo you own a rifle?"}, STUDENT)
+    (finding,) = [f for f in result["findings"] if f["rule"] == "firearms"]
+    assert finding["page"] == 2
+    assert finding["line"] == "Do you own a rifle?"
+
+
+def test_missing_required_statements(engine):
+    result = engine.scan({"PROPOSAL": "Participation is voluntary. Data destroyed by June 2027."}, STUDENT)
+    assert result["missing"] == []
+    result = engine.scan({"PROPOSAL": "A study of reading habits."}, STUDENT)
+    assert {rule["id"] for rule in result["missing"]} == {"voluntary", "destruction_date"}
@@ -0,0 +1,76 @@
+import json
+
+import pytest
+
+from checker.review import review_status
+from checker.revisions import action_steps
+from checker.rules import EXTERNAL, STUDENT
+from checker.structured import parse_review, render_review
+
+
+def _review(**values):
+    review = {"status": "REVISION NEEDED", "subjects": "MINORS", "action_steps": []}
+    review.update(values)
+    return json.dumps(review)
+
+
+@pytest.mark.parametrize("text", ["", "STATUS: PASS", '{"status": "PASS"', "[1, 2]", '"PASS"'])
+def test_invalid_json_is_rejected(text):
+    with pytest.raises(ValueError):
+        parse_review(text, STUDENT)
+
+
+def test_error_messages_leave_out_model_output():
+    with pytest.raises(ValueError) as error:
+        parse_review("500 internal error", STUDENT)
+    assert "500" not in str(error.value)
+
+
+@pytest.mark.parametrize("mode, status", [
+    (STUDENT, "RECOMMEND FOR REVIEW"),
+    (EXTERNAL, "PASS"),
+    (STUDENT, ""),
+])
+def test_status_must_belong_to_the_mode(mode, status):
+    with pytest.raises(ValueError):
+        parse_review(_review(status=status), mode)
+
+
+def test_status_is_case_insensitive():
+    assert parse_review(_review(status="pass"), STUDENT)["status"] == "PASS"
+
+
+def test_empty_steps_are_dropped_and_fields_cleaned():
+    review = parse_review(_review(action_steps=[
+        {"instruction": "  Add a parent consent form. ", "rationale": "Minors need it.",
+         "citations": ["Policy 6.4001", " "], "document": "CONSENT_FORMS"},
+        {"instruction": "   ", "rationale": "Nothing to do."},
+        "not an object",
+        {"rationale": "No instruction at all."},
+    ]), STUDENT)
+    assert review["action_steps"] == [{
+        "document": "CONSENT_FORMS",
+        "instruction": "Add a parent consent form.",
+        "rationale": "Minors need it.",
+        "citations": ["Policy 6.4001"],
+    }]
+
+
+@pytest.mark.parametrize("subjects", ["TEACHERS", "", None])
+def test_unknown_subjects_become_unclear(subjects):
+    assert parse_review(_review(subjects=subjects), STUDENT)["subjects"] == "UNCLEAR"
+
+
+@pytest.mark.parametrize("mode, status", [
+    (STUDENT, "PASS"), (STUDENT, "REVISION NEEDED"), (EXTERNAL, "RECOMMEND FOR REVIEW"),
+])
+def test_rendered_review_keeps_its_status(mode, status):
+    text = render_review(parse_review(_review(status=status), mode))
+    assert review_status(text) == status
+
+
+def test_rendered_steps_are_found_again_for_revisions():
+    text = render_review(parse_review(_review(action_steps=[
+        {"instruction": "Remove the religion question.", "rationale": "Policy forbids it.", "document": "SURVEY"},
+    ]), STUDENT))
+    assert action_steps(text).startswith("* **[Action Step 1]:** Remove the religion question. (SURVEY)")